@@ -0,0 +1,56 @@
+import argparse
+import timeit
+
+import carla
+
+from pycarlanet import CarlanetActor
+from pycarlanet.utils import preconditions
+
+from benchmarks.standins import StandInActor
+
+"""
+Cost of the attribute accesses done through CarlanetActor, compared with the previous proxy
+that validated the wrapped actor and forwarded each access with __getattribute__.
+
+Usage: python -m benchmarks.bench_actor_proxy [--number 1000000]
+"""
+
+
+class LegacyCarlanetActor:
+    def __init__(self, carla_actor: carla.Actor, alive: bool):
+        self._carla_actor = carla_actor
+        self._alive = alive
+
+    @preconditions('_carla_actor')
+    def __getattr__(self, *args):
+        return self._carla_actor.__getattribute__(*args)
+
+    @property
+    def alive(self):
+        return self._alive
+
+
+_ACCESSES = {
+    'id': lambda actor: actor.id,
+    'type_id': lambda actor: actor.type_id,
+    'get_transform': lambda actor: actor.get_transform,
+    'get_transform()': lambda actor: actor.get_transform(),
+    'alive': lambda actor: actor.alive,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=1000000)
+    args = parser.parse_args()
+
+    legacy, actor = LegacyCarlanetActor(StandInActor(1), True), CarlanetActor(StandInActor(1), True)
+    print(f'{"access":>16} {"legacy [ns]":>12} {"proxy [ns]":>12} {"speedup":>8}')
+    for name, access in _ACCESSES.items():
+        legacy_time = timeit.timeit(lambda: access(legacy), number=args.number) / args.number
+        proxy_time = timeit.timeit(lambda: access(actor), number=args.number) / args.number
+        print(f'{name:>16} {legacy_time * 1e9:>12.1f} {proxy_time * 1e9:>12.1f} {legacy_time / proxy_time:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+from pycarlanet import JsonCodec, MsgpackCodec
+
+"""
+Size and throughput of the codecs on UPDATED_POSITIONS messages of growing size.
+
+Usage: python -m benchmarks.bench_codecs [--actors 10 100 1000 10000]
+"""
+
+
+def _positions_message(n_actors):
+    return {
+        'message_type': 'UPDATED_POSITIONS',
+        'simulation_status': 0,
+        'actor_positions': [{
+            'actor_id': f'car_{i}',
+            'position': [i * 1.000123, -318.70001221 + i, 0.004],
+            'rotation': [0.0012, 90.2535, 0.0],
+            'velocity': [13.2117, 0.0031, -0.0107],
+            'is_net_active': True
+        } for i in range(n_actors)]
+    }
+
+
+def _throughput(fn, arg, min_time=0.2):
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        fn(arg)
+        runs += 1
+    return runs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--actors', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    codecs = [JsonCodec(), MsgpackCodec()]
+    print(f'{"actors":>8} {"codec":>8} {"size [B]":>10} {"encode [msg/s]":>15} {"decode [msg/s]":>15}')
+    for n_actors in args.actors:
+        message = _positions_message(n_actors)
+        for codec in codecs:
+            data = codec.encode(message)
+            assert codec.decode(data) == message
+            print(f'{n_actors:>8} {codec.name:>8} {len(data):>10} '
+                  f'{_throughput(codec.encode, message):>15.1f} {_throughput(codec.decode, data):>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
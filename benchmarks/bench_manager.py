@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sys
+import time
+
+import numpy as np
+import zmq
+
+from pycarlanet import CarlanetManager, JsonCodec, MsgpackCodec
+
+from benchmarks.standins import StandInListener, StandInWorld
+
+"""
+End-to-end benchmark of CarlanetManager without CARLA: a scripted REQ client plays the role of OMNeT++ and drives
+at full speed a manager that runs in another process, on a stand-in world.
+It sweeps actor count, message mix (fraction of GENERIC_MESSAGE among the messages) and size of the generic payload,
+and writes one JSON line per configuration with throughput and client-side latency percentiles.
+
+Usage: python -m benchmarks.bench_manager [--actors 1 100 10000] [--generic-ratio 0 0.5] [--payload-bytes 0 4096]
+                                          [--messages 500] [--codec json] [--output results.jsonl]
+"""
+
+CARLA_TIMESTEP = 0.05
+CODECS = {'json': JsonCodec, 'msgpack': MsgpackCodec}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+def _serve(port, end_timestamp, codec_name):
+    sys.stdout = open(os.devnull, 'w')  # Keep the output of the benchmark machine-readable
+    world = StandInWorld(timestep=CARLA_TIMESTEP)
+    manager = CarlanetManager(port, StandInListener(world, end_timestamp), codecs=[CODECS[codec_name]()])
+    manager.start_simulation()
+
+
+def _script(n_messages, generic_ratio, payload_bytes, seed=0):
+    """Messages sent after INIT, the last one is always a SIMULATION_STEP that ends the simulation"""
+    rnd = random.Random(seed)
+    payload = {'data': 'x' * payload_bytes}
+    timestamp, messages = 0.0, []
+    for i in range(n_messages):
+        if i < n_messages - 1 and rnd.random() < generic_ratio:
+            messages.append({'message_type': 'GENERIC_MESSAGE', 'timestamp': timestamp, 'user_defined': payload})
+        else:
+            timestamp += CARLA_TIMESTEP
+            messages.append({'message_type': 'SIMULATION_STEP', 'timestamp': timestamp})
+    return messages
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.percentile(np.asarray(latencies) * 1e3, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def run(n_actors, generic_ratio, payload_bytes, n_messages, codec_name):
+    messages = _script(n_messages, generic_ratio, payload_bytes)
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, messages[-1]['timestamp'], codec_name))
+    server.start()
+
+    context = zmq.Context()
+    req = context.socket(zmq.REQ)
+    req.connect(f'tcp://localhost:{port}')
+    handshake_codec, codec = JsonCodec(), CODECS[codec_name]()
+    init = {'message_type': 'INIT', 'timestamp': 0, 'run_id': 'bench', 'codecs': [codec.name],
+            'carla_configuration': {'seed': 0, 'carla_timestep': CARLA_TIMESTEP, 'sim_time_limit': 0},
+            'user_defined': {},
+            'moving_actors': [{'actor_id': f'actor_{i}', 'actor_type': 'car', 'actor_configuration': {}}
+                              for i in range(n_actors)]}
+    start = time.perf_counter()
+    req.send(handshake_codec.encode(init))
+    handshake_codec.decode(req.recv())
+    init_time = time.perf_counter() - start
+
+    latencies = {'SIMULATION_STEP': [], 'GENERIC_MESSAGE': []}
+    start = time.perf_counter()
+    for message in messages:
+        sent = time.perf_counter()
+        req.send(codec.encode(message))
+        codec.decode(req.recv())
+        latencies[message['message_type']].append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    server.join(10)
+    req.close()
+    context.term()
+    steps = len(latencies['SIMULATION_STEP'])
+    all_latencies = latencies['SIMULATION_STEP'] + latencies['GENERIC_MESSAGE']
+    return {
+        'actors': n_actors, 'generic_ratio': generic_ratio, 'payload_bytes': payload_bytes, 'codec': codec_name,
+        'messages': n_messages, 'steps': steps,
+        'init_s': init_time,
+        'steps_per_second': steps / elapsed,
+        'messages_per_second': n_messages / elapsed,
+        'latency': _percentiles(all_latencies),
+        'step_latency': _percentiles(latencies['SIMULATION_STEP']),
+        'generic_latency': _percentiles(latencies['GENERIC_MESSAGE']),
+        'python': platform.python_version(),
+        'time': time.time()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--actors', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--generic-ratio', type=float, nargs='+', default=[0.0, 0.5])
+    parser.add_argument('--payload-bytes', type=int, nargs='+', default=[0, 4096])
+    parser.add_argument('--messages', type=int, default=500, help='messages sent after INIT for each configuration')
+    parser.add_argument('--codec', choices=list(CODECS), default='json')
+    parser.add_argument('--output', help='file where results are appended as JSON lines, default stdout')
+    args = parser.parse_args()
+
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        for n_actors, generic_ratio, payload_bytes in itertools.product(args.actors, args.generic_ratio,
+                                                                       args.payload_bytes):
+            if generic_ratio == 0 and payload_bytes != args.payload_bytes[0]:
+                continue  # Without generic messages the payload size doesn't matter
+            result = run(n_actors, generic_ratio, payload_bytes, args.messages, args.codec)
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import time
+
+from pycarlanet import CarlanetActor, CarlanetManager
+from pycarlanet.CarlanetManager import RunningMessageHandlerState
+
+from benchmarks.standins import StandInListener, StandInWorld
+
+"""
+Compares the time of a SIMULATION_STEP when actor states are read from a single world snapshot and when
+each actor is queried one by one (actors missing from the snapshot).
+
+Usage: python -m benchmarks.bench_snapshot_positions [--actors 1 10 100 300] [--rpc-latency 0.0001]
+"""
+
+
+def _measure_step(n_actors, snapshot_contains_actors, rpc_latency, steps):
+    world = StandInWorld(rpc_latency=rpc_latency, snapshot_contains_actors=snapshot_contains_actors)
+    manager = CarlanetManager(0, StandInListener(world), collect_stats=False)
+    manager.carla_world = world
+    for i in range(n_actors):
+        manager.add_dynamic_actor(f'actor_{i}', CarlanetActor(world.spawn_actor(), True))
+    manager.set_message_handler_state(RunningMessageHandlerState)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': step * world.timestep})
+    return (time.perf_counter() - start) / steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--actors', type=int, nargs='+', default=[1, 10, 50, 100, 300])
+    parser.add_argument('--rpc-latency', type=float, default=0.0001, help='simulated latency of a CARLA call [s]')
+    parser.add_argument('--steps', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"actors":>8} {"per-actor [ms]":>16} {"snapshot [ms]":>16} {"speedup":>8}')
+    for n_actors in args.actors:
+        per_actor = _measure_step(n_actors, False, args.rpc_latency, args.steps)
+        snapshot = _measure_step(n_actors, True, args.rpc_latency, args.steps)
+        print(f'{n_actors:>8} {per_actor * 1e3:>16.3f} {snapshot * 1e3:>16.3f} {per_actor / snapshot:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
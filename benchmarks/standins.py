@@ -0,0 +1,132 @@
+import time
+
+import carla
+
+from pycarlanet import CarlanetActor, CarlanetEventListener, SimulatorStatus
+
+"""
+Stand-in objects for carla.World and carla.Actor, they allow to drive CarlanetManager without a CARLA server.
+Each call that in CARLA would be a request to the server sleeps rpc_latency seconds
+"""
+
+
+class StandInActorSnapshot:
+    def __init__(self, actor):
+        self._transform = actor.transform
+        self._velocity = actor.velocity
+
+    def get_transform(self):
+        return self._transform
+
+    def get_velocity(self):
+        return self._velocity
+
+
+class StandInActor:
+    def __init__(self, actor_id: int, rpc_latency=0.0):
+        self.id = actor_id
+        self.type_id = 'vehicle.standin'
+        self.attributes = {}
+        self.rpc_latency = rpc_latency
+        self.transform = carla.Transform(carla.Location(actor_id, actor_id, 0), carla.Rotation(0, 0, 0))
+        self.velocity = carla.Vector3D(0, 0, 0)
+
+    def _rpc(self):
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    def get_transform(self):
+        self._rpc()
+        return self.transform
+
+    def get_velocity(self):
+        self._rpc()
+        return self.velocity
+
+    def move(self, dt):
+        location = self.transform.location
+        self.velocity = carla.Vector3D(1, 0.5, 0)
+        self.transform = carla.Transform(carla.Location(location.x + dt, location.y + dt * 0.5, location.z),
+                                         self.transform.rotation)
+
+
+class _StandInTimestamp:
+    def __init__(self, frame, elapsed_seconds):
+        self.frame = frame
+        self.frame_count = frame
+        self.elapsed_seconds = elapsed_seconds
+
+
+class StandInSnapshot:
+    def __init__(self, world, include_actors=True):
+        self.timestamp = _StandInTimestamp(world.frame, world.elapsed_seconds)
+        self._actors = {a.id: StandInActorSnapshot(a) for a in world.actors.values()} if include_actors else {}
+
+    def find(self, actor_id):
+        return self._actors.get(actor_id)
+
+
+class StandInWorld:
+    """
+    :param snapshot_contains_actors: if False, snapshots don't contain any actor,
+        this reproduces the per-actor query of the state
+    """
+
+    def __init__(self, timestep=0.05, rpc_latency=0.0, snapshot_contains_actors=True):
+        self.timestep = timestep
+        self.rpc_latency = rpc_latency
+        self.snapshot_contains_actors = snapshot_contains_actors
+        self.actors = dict()
+        self.frame = 0
+        self.elapsed_seconds = 0.0
+
+    def _rpc(self):
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    def spawn_actor(self):
+        actor = StandInActor(len(self.actors) + 1, self.rpc_latency)
+        self.actors[actor.id] = actor
+        return actor
+
+    def tick(self):
+        self._rpc()
+        for actor in self.actors.values():
+            actor.move(self.timestep)
+        self.frame += 1
+        self.elapsed_seconds += self.timestep
+        return self.frame
+
+    def get_snapshot(self):
+        self._rpc()
+        return StandInSnapshot(self, self.snapshot_contains_actors)
+
+
+class StandInListener(CarlanetEventListener):
+    """
+    Listener that creates stand-in actors in a StandInWorld, echoes generic messages and
+    ends the simulation at end_timestamp
+    """
+
+    def __init__(self, world: StandInWorld, end_timestamp=None):
+        self.world = world
+        self.end_timestamp = end_timestamp
+
+    def omnet_init_completed(self, run_id, carla_configuration, user_defined):
+        if 'carla_timestep' in carla_configuration:
+            self.world.timestep = carla_configuration['carla_timestep']
+        return SimulatorStatus.RUNNING, self.world
+
+    def actor_created(self, actor_id: str, actor_type: str, actor_config) -> CarlanetActor:
+        return CarlanetActor(self.world.spawn_actor(), True)
+
+    def carla_simulation_step(self, timestamp) -> SimulatorStatus:
+        if self.end_timestamp is not None and timestamp >= self.end_timestamp:
+            return SimulatorStatus.FINISHED_OK
+        return SimulatorStatus.RUNNING
+
+    def generic_message(self, timestamp, user_defined_message):
+        return SimulatorStatus.RUNNING, user_defined_message
+
+    def simulation_finished(self, status_code: SimulatorStatus):
+        ...
@@ -2,15 +2,13 @@
 import collections
 import math
 import os
-import shutil
-import sys
 import weakref
 import datetime
 
 import carla
-import numpy as np
 import pygame
-from carla import ColorConverter as cc
+
+from pycarlanet import SensorPipeline, SensorFrame
 
 
 def get_actor_display_name(actor, truncate=250):
@@ -29,12 +27,15 @@ class TeleCarlaCameraSensor:
         self._output_path = None
         self.parent_actor = None
         self.image = None
+        self._on_frame = None
 
-    def add_display(self, display, output_path=None):
+    def add_display(self, display, output_path=None, on_frame=None):
+        """:param on_frame: called on the worker thread of the sensor pipeline after each image is converted"""
         self.display = display
         self._output_path = output_path
+        self._on_frame = on_frame
 
-    def attach_to_actor(self, tele_world, parent_actor):
+    def attach_to_actor(self, tele_world, parent_actor, sensor_pipeline: SensorPipeline):
         self._tele_world = tele_world
         self.parent_actor = parent_actor
         bound_x = 0.5 + parent_actor.bounding_box.extent.x
@@ -62,10 +63,13 @@ class TeleCarlaCameraSensor:
             attach_to=self.parent_actor,
             attachment_type=carla.AttachmentType.SpringArm)
 
-        # We need to pass the lambda a weak reference to
-        # self to avoid circular reference.
+        # The images are copied in the ring of the pipeline by the thread of CARLA and converted on its worker
+        # thread, so they don't slow down the steps of OMNeT++.
+        # We need to pass the lambda a weak reference to self to avoid circular reference.
         weak_self = weakref.ref(self)
-        self.sensor.listen(lambda image: TeleCarlaCameraSensor._parse_image(weak_self, image))
+        shape = (bp.get_attribute('image_size_y').as_int(), bp.get_attribute('image_size_x').as_int(), 4)
+        sensor_pipeline.attach('camera', self.sensor, shape,
+                               consumer=lambda _, frame: TeleCarlaCameraSensor._parse_image(weak_self, frame))
 
     def render(self):
         """Render method"""
@@ -79,28 +83,20 @@ class TeleCarlaCameraSensor:
     def done(self, timestamp):
         return self.image is None or self.image.frame == timestamp.frame
 
-    """
-    This method causes the simulator to misbehave with rendering option, because this method is on another thread,
-    so the main thread doesn't wait this one to complete, and it could happen that finishes before that the last frame 
-    is rendered. if the option to save the image is enabled is also slower, maybe because it's an hard operation and cpu is full. 
-    """
-
     @staticmethod
-    def _parse_image(weak_self, image):
+    def _parse_image(weak_self, frame: SensorFrame):
+        """Called on the worker thread of the sensor pipeline, frame.data is the BGRA image"""
         self = weak_self()
-        if not self or (self.image is not None and image.frame < self.image.frame):
+        if not self:
             return
-        self.image = image
+        self.image = frame
         if self.display:
-            image.convert(cc.Raw)
-            array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-            array = np.reshape(array, (image.height, image.width, 4))
-            array = array[:, :, :3]
-            array = array[:, :, ::-1]
+            array = frame.data[:, :, 2::-1]  # BGRA to RGB
             self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
             if self._output_path is not None:
-                image.save_to_disk(f'{self._output_path}{image.frame}')
-
+                pygame.image.save(self.surface, f'{self._output_path}{frame.frame}.png')
+            if self._on_frame is not None:
+                self._on_frame()
 
 
 class HUD(object):
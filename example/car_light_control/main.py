@@ -5,7 +5,7 @@ from carla import libcarla, ActorBlueprint, World
 import traceback
 import pygame
 
-from pycarlanet import CarlanetActor
+from pycarlanet import spawn_actors, SensorPipeline
 from pycarlanet import CarlanetManager
 from pycarlanet import CarlanetEventListener, SimulatorStatus
 
@@ -29,6 +29,7 @@ class MyWorld(CarlanetEventListener):
         self.carlanet_actors = dict()
         self._car = None
         self.remote_agent = RemoteAgent()
+        self.sensor_pipeline = SensorPipeline()
 
     def start_simulation(self):
         self.carlanet_manager.start_simulation()
@@ -69,31 +70,34 @@ class MyWorld(CarlanetEventListener):
 
         return SimulatorStatus.RUNNING, self.sim_world
 
-    def actor_created(self, actor_id: str, actor_type: str, actor_config) -> CarlanetActor:
-        if actor_type == 'car':  # and actor_id == 'car_1':
-            blueprint: ActorBlueprint = random.choice(self.sim_world.get_blueprint_library().filter("vehicle.tesla.model3"))
-
-            spawn_points = self.sim_world.get_map().get_spawn_points()
-            # Attach sensors
-            spawn_point = random.choice(spawn_points)
-            print(blueprint)
-            response = self.client.apply_batch_sync([carla.command.SpawnActor(blueprint, spawn_point)])[0]
-            carla_actor: carla.Vehicle = self.sim_world.get_actor(response.actor_id)
-            carla_actor.set_simulate_physics(True)
-            carla_actor.set_autopilot(False)
-            carlanet_actor = CarlanetActor(carla_actor, True)
+    def actors_created(self, actor_specs) -> dict:
+        blueprint: ActorBlueprint = random.choice(self.sim_world.get_blueprint_library().filter("vehicle.tesla.model3"))
+        spawn_points = self.sim_world.get_map().get_spawn_points()
+        spawns, unknown_types = [], dict()
+        for spec in actor_specs:
+            if spec['actor_type'] != 'car':
+                # Reported to OMNeT++ in failed_actors, the other actors are created anyway
+                unknown_types[spec['actor_id']] = RuntimeError(f'I don\'t know this type {spec["actor_type"]}')
+                continue
+            spawns.append((spec['actor_id'], blueprint, random.choice(spawn_points)))
+
+        # All the cars are spawned with a single batch and a single tick
+        actors = {**unknown_types, **spawn_actors(self.client, spawns, do_tick=True)}
+        for actor_id, carlanet_actor in actors.items():
+            if isinstance(carlanet_actor, Exception):
+                print(f'{actor_id} not spawned: {carlanet_actor}')
+                continue
+            carlanet_actor.set_simulate_physics(True)
+            carlanet_actor.set_autopilot(False)
             self.carlanet_actors[actor_id] = carlanet_actor
-            self._car = carlanet_actor
+            if self._car is None:
+                self._car = carlanet_actor
+                camera_sensor = TeleCarlaCameraSensor(2.2)
+                self._create_display(carlanet_actor.carla_actor, 1280, 720, camera_sensor)
+                camera_sensor.attach_to_actor(self.sim_world, carlanet_actor.carla_actor, self.sensor_pipeline)
+                self.sensor_pipeline.start()
+        return actors
 
-            self.sim_world.tick()
-
-            camera_sensor = TeleCarlaCameraSensor(2.2)
-            self._create_display(carla_actor, 1280, 720, camera_sensor)
-            camera_sensor.attach_to_actor(self.sim_world, carla_actor)
-            return carlanet_actor
-        else:
-            raise RuntimeError(f'I don\'t know this type {actor_type}')
-        
     def _create_display(self, player, camera_width, camera_height, camera_sensor):
         pygame.init()
         pygame.font.init()
@@ -102,14 +106,15 @@ class MyWorld(CarlanetEventListener):
         pygame.display.flip()
 
         hud = HUD(player, pygame.time.Clock(), display)
-        camera_sensor.add_display(display)
 
-        def render(_):
+        # The display is drawn by the worker of the sensor pipeline once each image is converted, so the pygame calls
+        # run on a single thread and never in the callbacks of CARLA, which would delay the steps of OMNeT++
+        def render():
             camera_sensor.render()
             hud.render()
             pygame.display.flip()
 
-        self.sim_world.on_tick(render)
+        camera_sensor.add_display(display, on_frame=render)
         self.sim_world.on_tick(hud.tick)
 
     def carla_init_completed(self):
@@ -119,7 +124,6 @@ class MyWorld(CarlanetEventListener):
         super().before_world_tick(timestamp)
 
     def carla_simulation_step(self, timestamp) -> SimulatorStatus:
-        self.sim_world.tick()
         # Do all the things, save actors data
         if timestamp > 100:  # ts_limit
             return SimulatorStatus.FINISHED_OK
@@ -181,10 +185,12 @@ class MyWorld(CarlanetEventListener):
             raise RuntimeError(f"I don\'t know this type {user_defined_message['msg_type']}")
 
     def simulation_finished(self, status_code: SimulatorStatus):
+        self.sensor_pipeline.stop()
         super().simulation_finished(status_code)
 
     def simulation_error(self, exception):
         traceback.print_exc()
+        self.sensor_pipeline.stop()
         super().simulation_error(exception)
 
 
@@ -0,0 +1,78 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import zmq
+import zmq.asyncio
+
+from pycarlanet import CarlanetStats
+from pycarlanet.CarlanetManager import CarlanetManager, OmnetTimeoutCarlanetError
+
+"""
+CarlanetManager running on asyncio: the socket is served by zmq.asyncio, so while the manager waits for OMNeT++
+the event loop is free to run other tasks (e.g. remote agents, sensor pulls, logging started by the listener).
+Messages are handled by the same state machine of CarlanetManager, in a worker thread, so that blocking calls to
+CARLA never stall the event loop; callbacks of the listener can be either plain methods or coroutines,
+the latter are run on the event loop.
+"""
+
+
+class AsyncCarlanetManager(CarlanetManager):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop: asyncio.AbstractEventLoop = None
+
+    def _start_server(self):
+        self.socket = self._create_socket(zmq.asyncio.Context())
+        print("server running")
+
+    def _call_callback(self, callback_name, *args, **kwargs):
+        result = super()._call_callback(callback_name, *args, **kwargs)
+        if inspect.isawaitable(result):
+            # Called by the worker thread, the coroutine runs on the event loop; it's measured until it completes
+            return asyncio.run_coroutine_threadsafe(result, self._loop).result()
+        return result
+
+    async def _invoke_listener_async(self, callback_name, *args, **kwargs):
+        """Invoke a callback from the event loop, awaiting it if it's a coroutine"""
+        start = time.perf_counter()
+        try:
+            result = super()._call_callback(callback_name, *args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            self._record_callback(callback_name, time.perf_counter() - start)
+
+    async def start_simulation_async(self):
+        self._loop = asyncio.get_running_loop()
+        self._start_server()
+        self._start_run()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='carlanet-handler') as executor:
+            try:
+                while not self._is_simulation_finished():
+                    start = time.perf_counter()
+                    timeout = self._recv_deadline()
+                    if timeout is not None and not await self.socket.poll(timeout):
+                        raise OmnetTimeoutCarlanetError(self._recv_timeout, self.timestamp)
+                    message = await self.socket.recv()
+                    self._stats.record(CarlanetStats.RECV_WAIT, time.perf_counter() - start)
+                    frames = await self._loop.run_in_executor(executor, self._handle_raw_message, message)
+                    start = time.perf_counter()
+                    await self.socket.send_multipart(frames, copy=False)
+                    self._transport.count_copies(frames, self.socket.copy_threshold)
+                    self._stats.record(CarlanetStats.SEND, time.perf_counter() - start)
+                    self._answer_sent()
+                self._dump_stats()
+                await self._invoke_listener_async('simulation_finished', self._message_handler.simulator_status_code)
+            except Exception as e:
+                await self._invoke_listener_async('simulation_error', e)
+            finally:
+                self._end_run()
+                self.socket.close()
+
+    def start_simulation(self):
+        """Synchronous adapter, runs the manager on a new event loop until the end of the simulation"""
+        asyncio.run(self.start_simulation_async())
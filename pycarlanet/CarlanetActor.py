@@ -2,7 +2,59 @@ import abc
 
 import carla
 
-from pycarlanet.utils import preconditions
+
+class ActorQueryCache:
+    """
+    Tick-scoped cache of the queries of the actors (MEMOIZED_QUERIES), shared by the listener and the manager:
+    within a tick each query is sent to CARLA once. Each registry owns one, attached to the actors it tracks, so the
+    runs of a CarlanetMultiRunServer don't share it; the manager starts a new epoch after each world.tick(),
+    which invalidates the values cached by its actors
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_tick(self):
+        self.epoch += 1
+
+    def counters(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+# Queries without arguments whose result changes only when the world is ticked or the actor is modified
+MEMOIZED_QUERIES = frozenset({'get_transform', 'get_location', 'get_velocity', 'get_angular_velocity',
+                              'get_acceleration', 'get_control', 'get_light_state', 'get_traffic_light_state'})
+# Methods that modify the actor, they invalidate its cached queries
+INVALIDATING_PREFIXES = ('set_', 'apply_', 'add_', 'enable_', 'disable_', 'open_', 'close_')
+
+
+def _copy_transform(transform):
+    location, rotation = transform.location, transform.rotation
+    return carla.Transform(carla.Location(location.x, location.y, location.z),
+                           carla.Rotation(rotation.pitch, rotation.yaw, rotation.roll))
+
+
+def _copy_control(control):
+    return carla.VehicleControl(control.throttle, control.steer, control.brake, control.hand_brake, control.reverse,
+                                control.manual_gear_shift, control.gear)
+
+
+# The results of the queries that can be modified by the caller are copied each time they are served from the cache,
+# e.g. after t = actor.get_transform(); t.location.z += 2 the next get_transform() still returns the state of CARLA
+_COPIES = {
+    carla.Transform: _copy_transform,
+    carla.Location: lambda location: carla.Location(location.x, location.y, location.z),
+    carla.Vector3D: lambda vector: carla.Vector3D(vector.x, vector.y, vector.z),
+    carla.VehicleControl: _copy_control,
+}
+
+
+def _copied(value):
+    copy = _COPIES.get(type(value))
+    return copy(value) if copy is not None else value
 
 
 # Pattern decorator for carla.Actor
@@ -10,18 +62,151 @@ from pycarlanet.utils import preconditions
 # CarlanetActor to a methods defined in carla you have to pass the attribute carla_actor
 # because carla can't see this class
 class CarlanetActor(abc.ABC):
+    # Methods of the carla actor are bound once and then served from _bound; id, type_id and attributes
+    # never change during the life of an actor, so they are read once
+    __slots__ = ('_carla_actor', '_alive', '_bound', '_id', '_type_id', '_attributes', '_cache', '_cache_epoch',
+                 '_query_cache', '_command_queue')
 
     def __init__(self, carla_actor: carla.Actor, alive: bool):
         self._carla_actor = carla_actor
         self._alive = alive
+        self._bound = dict()
+        self._id = self._type_id = self._attributes = None
+        self._cache = dict()
+        self._cache_epoch = None
+        self._query_cache: ActorQueryCache = None  # Queries are cached only for the actors tracked by a registry
+        self._command_queue = None
+
+    def __getattr__(self, name):
+        # Called only for the names that are not defined by the wrapper
+        if name in CarlanetActor.__slots__:
+            raise AttributeError(name)
+        bound = self._bound.get(name)
+        if bound is not None:
+            return bound
+        if self._carla_actor is None:
+            raise Exception(f"Violated prerequisites of method {name}")
+        value = getattr(self._carla_actor, name)
+        if callable(value):
+            if name in MEMOIZED_QUERIES:
+                value = self._memoized(name, value)
+            elif name.startswith(INVALIDATING_PREFIXES):
+                value = self._invalidating(value)
+            self._bound[name] = value
+        return value
+
+    def _tick_cache(self) -> dict:
+        if self._cache_epoch != self._query_cache.epoch:
+            self._cache.clear()
+            self._cache_epoch = self._query_cache.epoch
+        return self._cache
+
+    def _memoized(self, name, query):
+        def memoized_query(*args, **kwargs):
+            query_cache = self._query_cache
+            if args or kwargs or query_cache is None or not query_cache.enabled:
+                return query(*args, **kwargs)
+            cache = self._tick_cache()
+            if name in cache:
+                query_cache.hits += 1
+                return _copied(cache[name])
+            query_cache.misses += 1
+            value = cache[name] = query()
+            return _copied(value)
+
+        return memoized_query
 
-    @preconditions('_carla_actor')
-    def __getattr__(self, *args):
-        return self._carla_actor.__getattribute__(*args)
+    def _invalidating(self, method):
+        def invalidating_method(*args, **kwargs):
+            self._cache.clear()
+            return method(*args, **kwargs)
+
+        return invalidating_method
+
+    def invalidate_cache(self):
+        """Discard the cached queries, needed only when the actor is modified without this wrapper"""
+        self._cache.clear()
+
+    def cache_state(self, transform, velocity):
+        """Seed the cache of the current tick with the state read from a world snapshot"""
+        if self._query_cache is not None and self._query_cache.enabled:
+            cache = self._tick_cache()
+            cache['get_transform'], cache['get_location'], cache['get_velocity'] = \
+                transform, transform.location, velocity
+
+    @property
+    def carla_actor(self) -> carla.Actor:
+        """The wrapped carla.Actor, to be passed to the methods of carla"""
+        return self._carla_actor
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._id = self._carla_actor.id
+        return self._id
+
+    @property
+    def type_id(self):
+        if self._type_id is None:
+            self._type_id = self._carla_actor.type_id
+        return self._type_id
+
+    @property
+    def attributes(self):
+        if self._attributes is None:
+            self._attributes = self._carla_actor.attributes
+        return self._attributes
+
+    def attach_command_queue(self, command_queue):
+        """Called by the registry of the manager that tracks the actor"""
+        self._command_queue = command_queue
+
+    def attach_query_cache(self, query_cache: ActorQueryCache):
+        """Called by the registry that tracks the actor, the queries are cached in the ticks of its manager"""
+        if query_cache is not self._query_cache:
+            self._cache.clear()
+            self._query_cache, self._cache_epoch = query_cache, query_cache.epoch
 
     def apply_command(self, command):
-        carla.command.ApplyVehicleControl(self.id, command)
+        """
+        Queue a command, applied together with the ones of all the actors right before the next world tick
+        :param command: a carla.command, or a carla.VehicleControl that is applied to this vehicle
+        """
+        if self._command_queue is None:
+            raise RuntimeError('Commands can be queued only for the actors tracked by a CarlanetManager')
+        if isinstance(command, carla.VehicleControl):
+            command = carla.command.ApplyVehicleControl(self.id, command)
+        self._command_queue.put(command)
+
+    def queue_light_state(self, light_state: carla.VehicleLightState):
+        self.apply_command(carla.command.SetVehicleLightState(self.id, light_state))
+
+    def queue_autopilot(self, enabled: bool, traffic_manager_port=8000):
+        self.apply_command(carla.command.SetAutopilot(self.id, enabled, traffic_manager_port))
 
     @property
     def alive(self):
         return self._alive
+
+
+def spawn_actors(client: carla.Client, spawns, alive=True, do_tick=False) -> dict:
+    """
+    Spawn many actors with a single batch, the failures of some actors don't stop the others
+    :param spawns: list of (actor_id, blueprint, transform)
+    :param alive: activeness of the CarlanetActor created
+    :param do_tick: tick the world once after all the actors are spawned
+    :return: {actor_id: CarlanetActor}, or the RuntimeError with the error of CARLA for the actors not spawned
+    """
+    responses = client.apply_batch_sync([carla.command.SpawnActor(blueprint, transform)
+                                         for _, blueprint, transform in spawns], do_tick)
+    spawned_ids = [response.actor_id for response in responses if not response.error]
+    carla_actors = {carla_actor.id: carla_actor for carla_actor in client.get_world().get_actors(spawned_ids)}
+    actors = dict()
+    for (actor_id, _, _), response in zip(spawns, responses):
+        if response.error:
+            actors[actor_id] = RuntimeError(response.error)
+        elif response.actor_id not in carla_actors:
+            actors[actor_id] = RuntimeError(f'Actor {response.actor_id} not found after being spawned')
+        else:
+            actors[actor_id] = CarlanetActor(carla_actors[response.actor_id], alive)
+    return actors
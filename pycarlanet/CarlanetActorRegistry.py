@@ -0,0 +1,193 @@
+import numpy as np
+
+from pycarlanet import CarlanetActor, ActorQueryCache
+
+"""
+Columnar registry of the actors tracked by CarlanetManager.
+The state of the actors (position, rotation, velocity and activeness) is kept in contiguous NumPy arrays,
+where each actor occupies a slot; removing an actor moves the last slot in its place (swap-remove),
+so slots are stable only between two changes of the registry.
+"""
+
+
+class CarlanetActorRegistry:
+    POSITION = 'position'
+    ROTATION = 'rotation'
+    VELOCITY = 'velocity'
+    ALIVE = 'alive'
+
+    def __init__(self, initial_capacity=64, command_queue=None, query_cache: ActorQueryCache = None):
+        """
+        :param command_queue: queue attached to the actors, used by their apply_command
+        :param query_cache: tick-scoped cache of the queries attached to the actors, by default one of this registry
+        """
+        self._capacity = max(1, initial_capacity)
+        self._slots = dict()
+        self._ids = []
+        self._actors = []
+        self._columns = dict()
+        self._fill_values = dict()
+        self._remove_listeners = []
+        self.timestamp = None
+        self.version = 0  # Incremented each time an actor is added, replaced or removed
+        self.command_queue = command_queue
+        self.query_cache = query_cache if query_cache is not None else ActorQueryCache()
+        self.add_column(self.POSITION, (3,))
+        self.add_column(self.ROTATION, (3,))
+        self.add_column(self.VELOCITY, (3,))
+        self.add_column(self.ALIVE, dtype=bool, fill_value=False)
+
+    def add_column(self, name, shape=(), dtype=np.float64, fill_value=0):
+        """
+        Add a column of per-actor data, it follows the actors when slots are moved.
+        Used by position filters to keep their own state next to the one of the actors
+        """
+        if name in self._columns:
+            raise KeyError(f'Column {name} already exists')
+        self._columns[name] = np.full((self._capacity, *shape), fill_value, dtype=dtype)
+        self._fill_values[name] = fill_value
+
+    def column(self, name, writable=False) -> np.ndarray:
+        """
+        :return: a view, without copy, on the rows of the current actors; it's read-only unless writable is True.
+            The view is valid until an actor is added or removed
+        """
+        view = self._columns[name][:len(self._ids)]
+        if not writable:
+            view.flags.writeable = False
+        return view
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.column(self.POSITION)
+
+    @property
+    def rotations(self) -> np.ndarray:
+        return self.column(self.ROTATION)
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self.column(self.VELOCITY)
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.column(self.ALIVE)
+
+    @property
+    def ids(self) -> tuple:
+        """Actor ids ordered by slot"""
+        return tuple(self._ids)
+
+    def slot(self, actor_id) -> int:
+        return self._slots[actor_id]
+
+    def add_remove_listener(self, listener):
+        """:param listener: called with (actor_id, slot) before an actor is removed"""
+        self._remove_listeners.append(listener)
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.full((self._capacity, *column.shape[1:]), self._fill_values[name], dtype=column.dtype)
+            grown[:len(column)] = column
+            self._columns[name] = grown
+
+    def __setitem__(self, actor_id, carlanet_actor: CarlanetActor):
+        self.version += 1
+        if isinstance(carlanet_actor, CarlanetActor):
+            carlanet_actor.attach_query_cache(self.query_cache)
+            if self.command_queue is not None:
+                carlanet_actor.attach_command_queue(self.command_queue)
+        if actor_id in self._slots:
+            self._actors[self._slots[actor_id]] = carlanet_actor
+            return
+        if len(self._ids) == self._capacity:
+            self._grow()
+        self._slots[actor_id] = len(self._ids)
+        self._ids.append(actor_id)
+        self._actors.append(carlanet_actor)
+
+    def __delitem__(self, actor_id):
+        slot = self._slots[actor_id]
+        self.version += 1
+        for listener in self._remove_listeners:
+            listener(actor_id, slot)
+        last = len(self._ids) - 1
+        if slot != last:
+            last_id = self._ids[last]
+            self._ids[slot], self._actors[slot] = last_id, self._actors[last]
+            self._slots[last_id] = slot
+            for column in self._columns.values():
+                column[slot] = column[last]
+        for name, column in self._columns.items():
+            column[last] = self._fill_values[name]
+        del self._slots[actor_id]
+        self._ids.pop()
+        self._actors.pop()
+
+    def __getitem__(self, actor_id) -> CarlanetActor:
+        return self._actors[self._slots[actor_id]]
+
+    def __contains__(self, actor_id):
+        return actor_id in self._slots
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def keys(self):
+        return self._slots.keys()
+
+    def values(self):
+        return list(self._actors)
+
+    def items(self):
+        return list(zip(self._ids, self._actors))
+
+    def update(self, world_snapshot):
+        """
+        Read the state of all the actors from the snapshot, actors missing from it are queried one by one.
+        The state read from the snapshot is also cached by the actors for the rest of the tick
+        """
+        n = len(self._ids)
+        states = []
+        for actor in self._actors:
+            actor_snapshot = world_snapshot.find(actor.id)
+            if actor_snapshot is not None:
+                transform, velocity = actor_snapshot.get_transform(), actor_snapshot.get_velocity()
+                actor.cache_state(transform, velocity)
+            else:
+                # Served by the tick cache of the actor when the listener already queried it
+                transform, velocity = actor.get_transform(), actor.get_velocity()
+            location, rotation = transform.location, transform.rotation
+            states.append((location.x, location.y, location.z, rotation.pitch, rotation.yaw, rotation.roll,
+                           velocity.x, velocity.y, velocity.z))
+        if n:
+            states = np.asarray(states, dtype=np.float64)
+            self._columns[self.POSITION][:n] = states[:, 0:3]
+            self._columns[self.ROTATION][:n] = states[:, 3:6]
+            self._columns[self.VELOCITY][:n] = states[:, 6:9]
+            self._columns[self.ALIVE][:n] = [actor.alive for actor in self._actors]
+        self.timestamp = world_snapshot.timestamp.elapsed_seconds
+
+    def to_actor_positions(self, selected: np.ndarray = None) -> list:
+        """
+        :param selected: boolean mask of the slots to serialize, None for all the actors
+        :return: actor_positions field of the messages sent to OMNeT++
+        """
+        n = len(self._ids)
+        if selected is None:
+            rows, ids = slice(0, n), self._ids
+        else:
+            rows = np.flatnonzero(selected)
+            ids = [self._ids[slot] for slot in rows.tolist()]
+        return [{'actor_id': actor_id, 'position': position, 'rotation': rotation, 'velocity': velocity,
+                 'is_net_active': alive}
+                for actor_id, position, rotation, velocity, alive in zip(
+                    ids,
+                    self._columns[self.POSITION][rows].tolist(),
+                    self._columns[self.ROTATION][rows].tolist(),
+                    self._columns[self.VELOCITY][rows].tolist(),
+                    self._columns[self.ALIVE][rows].tolist())]
@@ -0,0 +1,60 @@
+import abc
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+"""
+Codecs used to serialize the messages exchanged with OMNeT++.
+The INIT handshake is always encoded in JSON; OMNeT++ can list in the INIT message the codecs it supports
+(field 'codecs') and the manager replies in INIT_COMPLETED with the one chosen (field 'codec'),
+which is used for all the following messages.
+"""
+
+
+class CarlanetCodec(abc.ABC):
+    name: str = None
+
+    @abc.abstractmethod
+    def encode(self, message: dict) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> dict:
+        ...
+
+
+class JsonCodec(CarlanetCodec):
+    name = 'json'
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message).encode('utf-8')
+
+    def decode(self, data: bytes) -> dict:
+        return json.loads(data.decode('utf-8'))
+
+
+class MsgpackCodec(CarlanetCodec):
+    """Binary codec based on MessagePack, it requires the optional dependency msgpack"""
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('MsgpackCodec requires msgpack, install it with: pip install pycarlanet[msgpack]')
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data: bytes) -> dict:
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {codec.name: codec for codec in [JsonCodec, MsgpackCodec]}
+
+
+def codec_by_name(name) -> CarlanetCodec:
+    if name not in CODECS:
+        raise ValueError(f'Unknown codec {name}')
+    return CODECS[name]()
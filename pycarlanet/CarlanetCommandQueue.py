@@ -0,0 +1,29 @@
+import threading
+
+"""
+Queue of the commands for the actors (controls, light states, autopilot, ...) issued during a step.
+The manager applies all of them with a single client.apply_batch right before the next world tick,
+instead of a call to CARLA for each command.
+"""
+
+
+class CommandQueue:
+    def __init__(self):
+        self._commands = []
+        self._lock = threading.Lock()
+
+    def put(self, command):
+        """:param command: a carla.command, e.g. carla.command.SetVehicleLightState(actor.id, light_state)"""
+        with self._lock:
+            self._commands.append(command)
+
+    def __len__(self):
+        return len(self._commands)
+
+    def flush(self, client) -> int:
+        """:return: number of commands applied"""
+        with self._lock:
+            commands, self._commands = self._commands, []
+        if commands:
+            client.apply_batch(commands)
+        return len(commands)
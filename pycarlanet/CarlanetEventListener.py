@@ -5,7 +5,8 @@ from pycarlanet import CarlanetActor
 from carla.libcarla import World
 
 """
-Listener for OMNeT world, note, every parameters gave as in input is a String, so eventually you need to use cast
+Listener for OMNeT world, note, every parameters gave as in input is a String, so eventually you need to use cast.
+With AsyncCarlanetManager each callback can also be a coroutine
 """
 
 
@@ -39,6 +40,17 @@ class CarlanetEventListener(abc.ABC):
         ...
         ##return Actor
 
+    def actors_created(self, actor_specs) -> dict:
+        """
+        Called at the beginning of the simulation with all the actors of OMNeT++, instead of actor_created,
+        so that they can be created in CARLA with a single batch, e.g. with spawn_actors.
+        When it isn't overridden, the manager calls actor_created for each actor
+        :param actor_specs: list of {actor_id, actor_type, actor_configuration}
+        :return: {actor_id: CarlanetActor}; an actor that couldn't be created can be missing or mapped to
+            the exception that explains why, it's reported to OMNeT++ in failed_actors
+        """
+        ...
+
     def carla_init_completed(self):
         """Called when the initialization of CARLA World is finished"""
         ...
@@ -51,14 +63,32 @@ class CarlanetEventListener(abc.ABC):
         """
         ...
 
+    def after_world_tick(self, timestamp) -> None:
+        """
+        Method called after each world tick; when OMNeT++ steps coarser than carla_timestep the world is ticked
+        several times in a single step, and this method is called after each of them
+        :param timestamp: OMNeT++ timestamp corresponding to the tick
+        """
+        ...
+
     def carla_simulation_step(self, timestamp) -> SimulatorStatus:
         """
-        Method called after a world tick called by OMNeT++
+        Method called after the world ticks of a step called by OMNeT++
         :param timestamp
         :return: current simulator status
         """
         ...
 
+    def lookahead_allowed(self, timestamp) -> bool:
+        """
+        Called after each step, if it returns True the next step (world ticks and carla_simulation_step) is run
+        in background while OMNeT++ processes the answer, so it must not depend on the messages received from OMNeT++
+        in the meantime. When OMNeT++ steps further than predicted, the remaining ticks are done in a further step
+        :param timestamp
+        :return: True to run the next step in advance
+        """
+        return False
+
     def generic_message(self, timestamp, user_defined_message) -> (SimulatorStatus, dict):
         """
         :param timestamp:
@@ -67,6 +97,16 @@ class CarlanetEventListener(abc.ABC):
         """
         ...
 
+    def generic_messages(self, timestamp, user_defined_messages) -> (SimulatorStatus, list):
+        """
+        Called with all the user defined messages sent by OMNeT++ at the same timestamp in a GENERIC_MESSAGES.
+        When it isn't overridden, the manager calls generic_message for each of them, until one doesn't return RUNNING
+        :param timestamp:
+        :param user_defined_messages: list of user defined messages
+        :return: (current simulator status, list of the responses, in the order of the messages)
+        """
+        ...
+
     def simulation_finished(self, status_code: SimulatorStatus):
         """
         Callback called upon successful completion of the simulation
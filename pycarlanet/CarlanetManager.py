@@ -1,12 +1,30 @@
 import abc
+import gc
 import json
 import os
+import time
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import carla
+import numpy as np
 import zmq
 from carla.libcarla import World
 
 from pycarlanet import CarlanetEventListener, SimulatorStatus
 from pycarlanet import CarlanetActor
+from pycarlanet import CarlanetActorRegistry
+from pycarlanet import CarlanetCodec, JsonCodec
+from pycarlanet.CarlanetMessages import CarlanetMessage, CarlanetReply, decode_message, REQUESTS
+from pycarlanet.CarlanetMessages import InitCompletedMessage, UpdatedPositionsMessage, GenericResponseMessage, \
+    GenericResponsesMessage
+from pycarlanet import CarlanetStats, COUNT_BUCKETS
+from pycarlanet import CommandQueue
+from pycarlanet import CarlanetTransport, TcpTransport, SharedMemoryTransport
+from pycarlanet import MessageLogger
+from pycarlanet import MetricsExporter, RunMetrics
+from pycarlanet import Watchdog, SlowCallbackWarning
+from pycarlanet.CarlanetRecorder import SessionRecorder
 from pycarlanet.utils import preconditions
 
 
@@ -18,55 +36,294 @@ class UnknownMessageCarlanetError(RuntimeError):
         return "I don't know how to handle the following msg: " + self.unknown_msg['message_type']
 
 
+class OmnetTimeoutCarlanetError(TimeoutError):
+    def __init__(self, timeout, timestamp):
+        super().__init__(f'No message from OMNeT++ for {timeout} s after the timestamp {timestamp}')
+        self.timeout = timeout
+        self.timestamp = timestamp
+
+
 # .get_snapshot().timestamp.elapsed_seconds
 class CarlanetManager:
     def __init__(self, listening_port, omnet_world_listener: CarlanetEventListener, save_config_path=None,
-                 socket_options=None, log_messages=False):
+                 socket_options=None, log_messages=False, codecs=None, position_filters=None, collect_stats=True,
+                 record_path=None, transport: CarlanetTransport = None, carla_client: carla.Client = None,
+                 metrics_exporter: MetricsExporter = None, recv_timeout=None, step_deadline=None,
+                 callback_budget=None):
+        """
+        :param codecs: codecs that can be negotiated with OMNeT++ in the INIT handshake, in order of preference.
+            JSON is used when OMNeT++ doesn't support any of them
+        :param position_filters: filters applied in order to the actor positions sent to OMNeT++,
+            e.g. DeltaPositionFilter to send only the actors that changed
+        :param collect_stats: collect the latency histograms of the phases of the main loop, see stats()
+        :param record_path: file where all the messages of the session are recorded, the session can be replayed
+            without CARLA with CarlanetReplayManager
+        :param transport: endpoint of the socket and transport of the actor positions, by default TCP on
+            listening_port; IpcTransport and SharedMemoryTransport are meant for OMNeT++ on the same machine
+        :param carla_client: client used to apply the queued commands, it can also be set later in carla_client
+        :param log_messages: True to log each message to stdout, or a MessageLogger to choose the output,
+            the sampling and the capture of the payloads
+        :param metrics_exporter: exports the live metrics of the run (messages, step duration, real-time factor,
+            actors, timestamp) from its own thread, e.g. PrometheusExporter or ZmqMetricsPublisher
+        :param recv_timeout: maximum wait for the next message of OMNeT++ after the first one [s]; when it expires
+            the run ends with OmnetTimeoutCarlanetError through simulation_error. None to wait forever
+        :param step_deadline: maximum duration of the handling of a message [s], a message still in progress
+            after it emits a SlowCallbackWarning with the phase it's stuck in
+        :param callback_budget: maximum duration of the callbacks of the listener [s], or {callback name: budget};
+            a callback that takes longer emits a SlowCallbackWarning
+        """
         self._listening_port = listening_port
         self._omnet_world_listener = omnet_world_listener
         self._message_handler: MessageHandlerState = None
-        self._carlanet_actors = dict()
-        self._log_messages = log_messages
+        self._command_queue = CommandQueue()
+        self._carlanet_actors = CarlanetActorRegistry(command_queue=self._command_queue)
+        self.carla_client: carla.Client = carla_client
+        self._logger = log_messages if isinstance(log_messages, MessageLogger) else \
+            MessageLogger() if log_messages else None
         self._save_config_path = save_config_path
         self.socket_options = socket_options if socket_options else {}
+        self._codecs = list(codecs) if codecs else [JsonCodec()]
+        self._codec: CarlanetCodec = JsonCodec()
+        self._negotiated_codec: CarlanetCodec = None
+        self._position_filters = list(position_filters) if position_filters else []
+        for position_filter in self._position_filters:
+            position_filter.attach(self._carlanet_actors)
         self.carla_world: World = None
-
-    def _start_server(self):
-        context = zmq.Context()
+        self._carla_timestep = None
+        self._last_step_timestamp = None
+        self._tick_drift = 0.0
+        self._stats = CarlanetStats(collect_stats)
+        self._record_path = record_path
+        self._recorder: SessionRecorder = None
+        self._transport = transport if transport else TcpTransport(listening_port)
+        if record_path and isinstance(self._transport, SharedMemoryTransport):
+            # The recorded replies would point to blocks of a shared memory removed at the end of the run
+            raise ValueError('A session that uses SharedMemoryTransport can\'t be recorded')
+        self._transport.attach(self._stats)
+        self._gc_collections = self._count_gc_collections()
+        self._metrics_exporter = metrics_exporter
+        self._metrics: RunMetrics = None
+        self.timestamp = None
+        self._recv_timeout = recv_timeout
+        self._watchdog = Watchdog(step_deadline, self._step_overrun) if step_deadline else None
+        self._phase = None  # Phase of the main loop in progress, reported when a step is over its deadline
+        self._callback_budgets = dict(callback_budget) if isinstance(callback_budget, dict) else {}
+        self._default_callback_budget = None if isinstance(callback_budget, dict) else callback_budget
+
+    def _create_socket(self, context):
         for opt_name, opt_value in self.socket_options.items():
             context.setsockopt(opt_name, opt_value)
-        self.socket = context.socket(zmq.REP)
-        self.socket.setsockopt(zmq.CONFLATE, 1)
-        self.socket.setsockopt(zmq.LINGER, 100)
-        self.socket.bind(f"tcp://*:{self._listening_port}")
+        socket = context.socket(zmq.REP)
+        if not self._transport.multipart:
+            # CONFLATE doesn't support multipart messages
+            socket.setsockopt(zmq.CONFLATE, 1)
+        socket.setsockopt(zmq.LINGER, 100)
+        socket.bind(self._transport.endpoint)
+        return socket
+
+    def _start_server(self):
+        self.socket = self._create_socket(zmq.Context())
         print("server running")
 
+    def _decode_message(self, message):
+        if self._recorder is not None:
+            self._recorder.record_request(message)
+        start = time.perf_counter()
+        data = decode_message(self._codec.decode(message))
+        self._stats.record(CarlanetStats.DECODE, time.perf_counter() - start)
+        self.timestamp = data.timestamp
+        if self._logger is not None:
+            self._logger.request(message, data.message_type, data.timestamp, self._codec)
+        return data
+
+    def _recv_deadline(self):
+        """:return: maximum wait for the next message [ms], None to wait forever"""
+        if self._recv_timeout is None or self.timestamp is None:
+            # OMNeT++ can take long to start, the timeout is applied once the run is in progress
+            return None
+        return self._recv_timeout * 1000
+
     def _receive_data_from_omnet(self):
+        start = time.perf_counter()
+        timeout = self._recv_deadline()
+        if timeout is not None and not self.socket.poll(timeout):
+            raise OmnetTimeoutCarlanetError(self._recv_timeout, self.timestamp)
         message = self.socket.recv()
-        json_data = json.loads(message.decode("utf-8"))
-        self.timestamp = json_data['timestamp']
-        if self._log_messages:
-            print(f'Received msg: {json_data}\n')
-        return json_data
+        self._stats.record(CarlanetStats.RECV_WAIT, time.perf_counter() - start)
+        return self._decode_message(message)
+
+    def _handle_raw_message(self, message) -> list:
+        """Handle an encoded message of OMNeT++ and return the frames of the answer, without using the socket"""
+        msg = self._decode_message(message)
+        answer = self._message_handler.handle_message(msg)
+        return self._encode_answer(answer)
+
+    def _is_simulation_finished(self):
+        return isinstance(self._message_handler, FinishedMessageHandlerState)
+
+    def _start_run(self):
+        if self._record_path:
+            self._recorder = SessionRecorder(self._record_path)
+        if self._logger is not None:
+            self._logger.start()
+        if self._metrics_exporter is not None:
+            self._metrics = RunMetrics()
+            self._metrics_exporter.attach(self._metrics)
+            self._metrics_exporter.start()
+        if self._watchdog is not None:
+            self._watchdog.start()
+        self.set_message_handler_state(InitMessageHandlerState)
+
+    def _end_run(self):
+        self._transport.close()
+        if self._logger is not None:
+            self._logger.stop()
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.stop()
+        if self._watchdog is not None:
+            self._watchdog.stop()
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
 
     def start_simulation(self):
         self._start_server()
-        self.set_message_handler_state(InitMessageHandlerState)
+        self._start_run()
         try:
-            while not isinstance(self._message_handler, FinishedMessageHandlerState):
+            while not self._is_simulation_finished():
                 msg = self._receive_data_from_omnet()
                 answer = self._message_handler.handle_message(msg)
                 self._send_data_to_omnet(answer)
-            self._omnet_world_listener.simulation_finished(self._message_handler.simulator_status_code)
+            self._simulation_finished()
         except Exception as e:
-            self._omnet_world_listener.simulation_error(e)
+            self._invoke_listener('simulation_error', e)
         finally:
+            self._end_run()
             self.socket.close()
 
+    def _simulation_finished(self):
+        self._dump_stats()
+        self._invoke_listener('simulation_finished', self._message_handler.simulator_status_code)
+
+    def _encode_answer(self, answer: CarlanetReply) -> list:
+        """:return: the frames of the answer, the encoded answer followed by the frames added by the transport"""
+        start = time.perf_counter()
+        data = self._codec.encode(answer.to_dict())
+        self._stats.record(CarlanetStats.ENCODE, time.perf_counter() - start)
+        if self._logger is not None:
+            self._logger.reply(data, answer.message_type, answer.actor_count(), self._codec)
+        frames = self._transport.frames(data)
+        if self._recorder is not None:
+            self._recorder.record_reply(*frames)
+        return frames
+
+    def _answer_sent(self):
+        if self._negotiated_codec is not None:
+            # The handshake reply is still encoded with the previous codec
+            self._codec, self._negotiated_codec = self._negotiated_codec, None
+            if self._recorder is not None:
+                self._recorder.record_codec(self._codec.name)
+        self._message_handler.answer_sent()
+
     def _send_data_to_omnet(self, answer):
-        if self._log_messages:
-            print(f'Sending msg: {answer}\n')
-        self.socket.send(json.dumps(answer).encode('utf-8'))
+        frames = self._encode_answer(answer)
+        start = time.perf_counter()
+        self._transport.send(self.socket, frames)
+        self._stats.record(CarlanetStats.SEND, time.perf_counter() - start)
+        self._answer_sent()
+
+    def _invoke_listener(self, callback_name, *args, **kwargs):
+        """All the callbacks of the listener are invoked through this method"""
+        previous_phase, self._phase = self._phase, CarlanetStats.LISTENER + callback_name
+        start = time.perf_counter()
+        try:
+            return self._call_callback(callback_name, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            self._phase = previous_phase
+            self._record_callback(callback_name, duration)
+
+    def _call_callback(self, callback_name, *args, **kwargs):
+        """:return: the result of the callback, AsyncCarlanetManager waits for the coroutines here"""
+        return getattr(self._omnet_world_listener, callback_name)(*args, **kwargs)
+
+    def _record_callback(self, callback_name, duration):
+        """Record the duration of a callback, and warn if it's over its budget"""
+        self._stats.record(CarlanetStats.LISTENER + callback_name, duration)
+        budget = self._callback_budgets.get(callback_name, self._default_callback_budget)
+        if budget is not None and duration > budget:
+            warnings.warn(SlowCallbackWarning(callback_name, self.timestamp, duration, budget))
+
+    def _step_overrun(self, message_type, elapsed):
+        """Called by the watchdog when the handling of a message is over step_deadline"""
+        phase = self._phase if self._phase is not None else 'the manager'
+        warnings.warn(SlowCallbackWarning(f'{message_type} (in {phase})', self.timestamp, elapsed,
+                                          self._watchdog.deadline))
+
+    def stats(self) -> dict:
+        """
+        :return: for each phase of the main loop (recv_wait, decode, listener.<callback>, world_tick,
+            positions.update, positions.serialize, encode, send) count, mean, p50, p99, max and total duration
+            in seconds, and the non-empty buckets of its histogram
+        """
+        self._update_counters()
+        return self._stats.summary()
+
+    @staticmethod
+    def _count_gc_collections():
+        return sum(generation['collections'] for generation in gc.get_stats())
+
+    def _update_counters(self):
+        self._stats.set_counter(CarlanetStats.GC_COLLECTIONS, self._count_gc_collections() - self._gc_collections)
+        for name, value in self._carlanet_actors.query_cache.counters().items():
+            self._stats.set_counter(CarlanetStats.ACTOR_CACHE + name, value)
+        if self._logger is not None:
+            self._stats.set_counter(CarlanetStats.LOG_DROPPED, self._logger.dropped)
+
+    def _dump_stats(self):
+        """Called at the end of the simulation, stats are saved in save_config_path or printed"""
+        if not self._stats.enabled:
+            return
+        self._update_counters()
+        if self._save_config_path:
+            if not os.path.exists(self._save_config_path):
+                os.makedirs(self._save_config_path)
+            with open(os.path.join(self._save_config_path, 'stats.json'), 'w') as f:
+                f.write(self._stats.to_json())
+        else:
+            print(self._stats.format())
+
+    def _negotiate_codec(self, omnet_codecs) -> CarlanetCodec:
+        """
+        Choose the first codec of the manager supported also by OMNeT++, it's applied after the reply to INIT
+        :param omnet_codecs: names of the codecs supported by OMNeT++, None if it supports only JSON
+        :return: the chosen codec
+        """
+        omnet_codecs = omnet_codecs if omnet_codecs else [JsonCodec.name]
+        codec = next((c for c in self._codecs if c.name in omnet_codecs), None)
+        self._negotiated_codec = codec if codec is not None else JsonCodec()
+        return self._negotiated_codec
+
+    @property
+    def actor_registry(self) -> CarlanetActorRegistry:
+        """Registry of the actors tracked by the manager, its array views can be used for vectorized analytics"""
+        return self._carlanet_actors
+
+    @property
+    def command_queue(self) -> CommandQueue:
+        """Commands queued here or with CarlanetActor.apply_command are applied in batch before the next tick"""
+        return self._command_queue
+
+    def _flush_commands(self):
+        depth = len(self._command_queue)
+        self._stats.record(CarlanetStats.COMMAND_QUEUE_DEPTH, depth, COUNT_BUCKETS)
+        if not depth:
+            return
+        if self.carla_client is None:
+            raise RuntimeError('carla_client must be set to apply the queued commands')
+        start = time.perf_counter()
+        self._command_queue.flush(self.carla_client)
+        self._stats.record(CarlanetStats.COMMAND_FLUSH, time.perf_counter() - start)
 
     def set_message_handler_state(self, msg_handler_cls, *args):
         self._message_handler = msg_handler_cls(self, *args)
@@ -88,38 +345,113 @@ class CarlanetManager:
         """
         del self._carlanet_actors[actor_id]
 
+    def _ticks_to_reach(self, timestamp, min_ticks=1) -> int:
+        """
+        Number of world ticks needed to follow OMNeT++ up to timestamp, the time not covered by an integer
+        number of carla_timestep is carried to the next steps.
+        By default the world is ticked at least once per step, as when OMNeT++ steps finer than CARLA
+        """
+        if not self._carla_timestep or self._last_step_timestamp is None:
+            ticks = min_ticks
+        else:
+            pending = self._tick_drift + timestamp - self._last_step_timestamp
+            ticks = int(round(pending / self._carla_timestep))
+            if ticks < min_ticks:
+                ticks = min_ticks
+                if min_ticks > 0:
+                    # CARLA is ahead only because of the tick required, it's not carried to the next steps
+                    pending = min_ticks * self._carla_timestep
+            self._tick_drift = pending - ticks * self._carla_timestep
+        self._last_step_timestamp = timestamp
+        return ticks
+
     def get_curr_sim_timestamp(self):
         return self.carla_world.get_snapshot().timestamp.elapsed_seconds
 
 
 class MessageHandlerState(abc.ABC):
+    _handlers = {}  # message_type: handler, the methods named after a message type
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The dispatch table is computed once per state
+        cls._handlers = {message_type: getattr(cls, message_type)
+                         for message_type in REQUESTS if hasattr(cls, message_type)}
+
     def __init__(self, carlanet_manager: CarlanetManager):
         self._manager = carlanet_manager
         self.omnet_world_listener: CarlanetEventListener = self._manager._omnet_world_listener
         self._carlanet_actors = self._manager._carlanet_actors
 
-    def handle_message(self, message):
-        message_type = message['message_type']
-        if hasattr(self, message_type):
-            meth = getattr(self, message_type)
-            return meth(message)
-        raise RuntimeError(f"""I'm in the following state: {self.__class__.__name__} and 
-                                    I don't know how to handle {message['message_type']} message""")
+    def _call_listener(self, callback_name, *args, **kwargs):
+        return self._manager._invoke_listener(callback_name, *args, **kwargs)
+
+    def _listener_overrides(self, callback_name):
+        """
+        :return: True if the listener defines its own batch callback; otherwise the manager calls the single
+            callback for each item, so that each call is measured and can be a coroutine
+        """
+        callback = getattr(type(self.omnet_world_listener), callback_name, None)
+        return callback is not None and callback is not getattr(CarlanetEventListener, callback_name)
+
+    def handle_message(self, message: CarlanetMessage) -> CarlanetReply:
+        """:param message: request of OMNeT++, a dict is decoded and validated first"""
+        if isinstance(message, dict):
+            message = decode_message(message)
+        for position_filter in self._manager._position_filters:
+            position_filter.message_received(message)
+        handler = self._handlers.get(message.message_type)
+        if handler is None:
+            raise RuntimeError(f"""I'm in the following state: {self.__class__.__name__} and 
+                                    I don't know how to handle {message.message_type} message""")
+        watchdog, metrics = self._manager._watchdog, self._manager._metrics
+        if watchdog is None and metrics is None:
+            return handler(self, message)
+        start = time.perf_counter()
+        if watchdog is not None:
+            watchdog.begin(message.message_type)
+        try:
+            answer = handler(self, message)
+        finally:
+            if watchdog is not None:
+                watchdog.end()
+        if metrics is not None:
+            metrics.message_handled(message.message_type, message.timestamp, time.perf_counter() - start,
+                                    len(self._carlanet_actors))
+        return answer
+
+    def answer_sent(self):
+        """Called after the answer to a message is sent to OMNeT++"""
+        ...
 
     @preconditions('_manager')
-    def _generate_carla_nodes_positions(self):
-        nodes_positions = []
-        for actor_id, actor in self._carlanet_actors.items():
-            transform: carla.Transform = actor.get_transform()
-            velocity: carla.Vector3D = actor.get_velocity()
-            position = dict()
-            position['actor_id'] = actor_id
-            position['position'] = [transform.location.x, transform.location.y, transform.location.z]
-            position['rotation'] = [transform.rotation.pitch, transform.rotation.yaw, transform.rotation.roll]
-            position['velocity'] = [velocity.x, velocity.y, velocity.z]
-            position['is_net_active'] = actor.alive
-            nodes_positions.append(position)
-        return nodes_positions
+    def _update_carla_nodes(self, world_snapshot=None):
+        # A single snapshot holds the state of every actor at the current frame, so reading from it
+        # costs one call to CARLA instead of two per actor
+        start = time.perf_counter()
+        if world_snapshot is None:
+            world_snapshot = self._manager.carla_world.get_snapshot()
+        self._carlanet_actors.update(world_snapshot)
+        self._manager._stats.record(CarlanetStats.POSITIONS_UPDATE, time.perf_counter() - start)
+
+    def _generate_carla_nodes_positions(self, world_snapshot=None):
+        self._update_carla_nodes(world_snapshot)
+        return self._carlanet_actors.to_actor_positions()
+
+    def _add_carla_nodes_positions(self, res, world_snapshot=None):
+        self._update_carla_nodes(world_snapshot)
+        self._select_carla_nodes_positions(res)
+
+    def _select_carla_nodes_positions(self, res):
+        """Add to res the positions of the actors in the registry, without updating it"""
+        start = time.perf_counter()
+        selected = None
+        if self._manager._position_filters:
+            selected = np.ones(len(self._carlanet_actors), dtype=bool)
+            for position_filter in self._manager._position_filters:
+                selected = position_filter.filter(self._carlanet_actors, selected, res)
+        self._manager._transport.write_positions(res, self._carlanet_actors, selected)
+        self._manager._stats.record(CarlanetStats.POSITIONS_SERIALIZE, time.perf_counter() - start)
 
 
 class InitMessageHandlerState(MessageHandlerState):
@@ -135,32 +467,54 @@ class InitMessageHandlerState(MessageHandlerState):
             with open(os.path.join(self._save_config_path, 'init.json'), 'w') as f:
                 json.dump(message, f)
 
+    def _create_actors(self, actor_specs) -> list:
+        """:return: failed_actors field of INIT_COMPLETED, [{actor_id, error}] of the actors not created"""
+        if self._listener_overrides('actors_created'):
+            created = self._call_listener('actors_created', actor_specs)
+        else:
+            created = {spec['actor_id']: self._call_listener('actor_created', spec['actor_id'], spec['actor_type'],
+                                                             spec['actor_configuration'])
+                       for spec in actor_specs}
+        failed_actors = []
+        for spec in actor_specs:
+            actor_id = spec['actor_id']
+            carlanet_actor = created.get(actor_id)
+            if carlanet_actor is None or isinstance(carlanet_actor, Exception):
+                error = str(carlanet_actor) if carlanet_actor is not None else 'not created by the listener'
+                failed_actors.append({'actor_id': actor_id, 'error': error})
+            else:
+                self._carlanet_actors[actor_id] = carlanet_actor
+        return failed_actors
+
     def INIT(self, message):
 
-        self._save_config(message)
-        res = dict()
-        res['message_type'] = 'INIT_COMPLETED'
+        self._save_config(message.to_dict())
+        res = InitCompletedMessage()
 
-        sim_status, carla_world = self.omnet_world_listener.omnet_init_completed(
-            run_id=message['run_id'],
-            carla_configuration=message['carla_configuration'],
-            user_defined=message['user_defined'])
+        sim_status, carla_world = self._call_listener(
+            'omnet_init_completed',
+            run_id=message.run_id,
+            carla_configuration=message.carla_configuration,
+            user_defined=message.user_defined)
 
         self._manager.carla_world = carla_world
+        self._manager._carla_timestep = message.carla_configuration.get('carla_timestep')
+        res.codec = self._manager._negotiate_codec(message.codecs).name
 
-        for static_carlanet_actor in message['moving_actors']:
-            actor_id = static_carlanet_actor['actor_id']
-            self._carlanet_actors[actor_id] = self.omnet_world_listener.actor_created(
-                actor_id,
-                static_carlanet_actor['actor_type'],
-                static_carlanet_actor['actor_configuration']
-            )
+        res['failed_actors'] = self._create_actors(message.moving_actors)
 
-        res['initial_timestamp'] = self._manager.get_curr_sim_timestamp()
-        res['simulation_status'] = sim_status.value
-        res['actor_positions'] = self._generate_carla_nodes_positions()
+        world_snapshot = self._manager.carla_world.get_snapshot()
+        res.initial_timestamp = world_snapshot.timestamp.elapsed_seconds
+        # OMNeT++ counts the time from initial_timestamp, the first step ticks the time elapsed since then
+        self._manager._last_step_timestamp, self._manager._tick_drift = res.initial_timestamp, 0.0
+        res.simulation_status = sim_status.value
+        for position_filter in self._manager._position_filters:
+            position_filter.reset()
+        self._add_carla_nodes_positions(res, world_snapshot)
+        # The options of the transport apply from the following steps
+        res.extra.update(self._manager._transport.negotiate(message))
 
-        self.omnet_world_listener.carla_init_completed()
+        self._call_listener('carla_init_completed')
 
         if sim_status == SimulatorStatus.RUNNING:
             self._manager.set_message_handler_state(RunningMessageHandlerState)
@@ -169,29 +523,132 @@ class InitMessageHandlerState(MessageHandlerState):
 
 
 class RunningMessageHandlerState(MessageHandlerState):
+    """
+    When the listener allows it (lookahead_allowed), the next step is run in background as soon as the answer
+    to SIMULATION_STEP is sent, predicting its timestamp from the last interval between steps of OMNeT++.
+    The next SIMULATION_STEP is answered with the buffered state if no further tick is needed to reach its timestamp,
+    otherwise the remaining ticks are done as in a normal step. Other messages wait for the background step to
+    finish, so CARLA is never used by two threads, and are handled normally, leaving the buffered state available.
+    """
+
+    def __init__(self, carlanet_manager: CarlanetManager):
+        super().__init__(carlanet_manager)
+        self._previous_timestamp = None
+        self._next_lookahead_timestamp = None
+        self._lookahead: Future = None
+        self._lookahead_executor: ThreadPoolExecutor = None
+
+    def handle_message(self, message):
+        if self._lookahead is not None:
+            self._lookahead.result()
+        return super().handle_message(message)
+
+    def _advance(self, timestamp, ticks):
+        self._call_listener('before_world_tick', timestamp)
+        updated_version = None
+        for remaining_ticks in range(ticks - 1, -1, -1):
+            self._manager._flush_commands()
+            start = time.perf_counter()
+            self._manager._phase = CarlanetStats.WORLD_TICK
+            self._manager.carla_world.tick()
+            self._manager._phase = None
+            self._carlanet_actors.query_cache.new_tick()
+            self._manager._stats.record(CarlanetStats.WORLD_TICK, time.perf_counter() - start)
+            tick_timestamp = timestamp
+            if remaining_ticks:
+                tick_timestamp -= remaining_ticks * self._manager._carla_timestep
+            else:
+                # The snapshot of the last tick seeds the tick cache before the callbacks, so the states read by
+                # the listener don't cost other calls to CARLA
+                self._update_carla_nodes()
+                updated_version = self._carlanet_actors.version
+            self._call_listener('after_world_tick', tick_timestamp)
+        sim_status = self._call_listener('carla_simulation_step', timestamp)
+        if updated_version != self._carlanet_actors.version:
+            # No tick was done, or the listener added or removed actors after the update
+            self._update_carla_nodes()
+        return sim_status
+
+    def _run_lookahead(self, timestamp):
+        # The background step is watched as the steps of the main thread, which waits for it before handling
+        # the next message
+        watchdog = self._manager._watchdog
+        if watchdog is not None:
+            watchdog.begin('SIMULATION_STEP (lookahead)')
+        try:
+            # CARLA can be ahead of the predicted timestamp, the ticks in advance are carried as the other steps
+            sim_status = self._advance(timestamp, self._manager._ticks_to_reach(timestamp, min_ticks=0))
+        finally:
+            if watchdog is not None:
+                watchdog.end()
+        return sim_status, self._carlanet_actors.version
+
+    def _predict_next_timestamp(self, timestamp):
+        interval = timestamp - self._previous_timestamp if self._previous_timestamp is not None else 0
+        return timestamp + (interval if interval > 0 else self._manager._carla_timestep)
+
+    def _set_finished(self, sim_status):
+        if self._lookahead_executor is not None:
+            self._lookahead_executor.shutdown(wait=False)
+        self._manager.set_message_handler_state(FinishedMessageHandlerState, sim_status)
+
     def SIMULATION_STEP(self, message):
-        res = dict()
-        self.omnet_world_listener.before_world_tick(message['timestamp'])
-        self._manager.carla_world.tick()
-        res['message_type'] = 'UPDATED_POSITIONS'
-        sim_status = self.omnet_world_listener.carla_simulation_step(message['timestamp'])
-        res['simulation_status'] = sim_status.value
-        res['actor_positions'] = self._generate_carla_nodes_positions()
+        timestamp = message.timestamp
+        lookahead, self._lookahead = self._lookahead, None
+        if lookahead is None:
+            sim_status = self._advance(timestamp, self._manager._ticks_to_reach(timestamp))
+        else:
+            ticks = self._manager._ticks_to_reach(timestamp, min_ticks=0)
+            sim_status, registry_version = lookahead.result()
+            if sim_status == SimulatorStatus.RUNNING and ticks > 0:
+                # OMNeT++ is further than predicted: the remaining ticks are done now
+                sim_status = self._advance(timestamp, ticks)
+            elif registry_version != self._carlanet_actors.version:
+                # Actors added or removed after the background step
+                self._update_carla_nodes()
+        res = UpdatedPositionsMessage(simulation_status=sim_status.value)
+        self._select_carla_nodes_positions(res)
+
         if sim_status != SimulatorStatus.RUNNING:
-            self._manager.set_message_handler_state(FinishedMessageHandlerState, sim_status)
+            self._set_finished(sim_status)
+        elif self._manager._carla_timestep and self._call_listener('lookahead_allowed', timestamp) is True:
+            self._next_lookahead_timestamp = self._predict_next_timestamp(timestamp)
+        self._previous_timestamp = timestamp
         return res
 
+    def answer_sent(self):
+        if self._next_lookahead_timestamp is None:
+            return
+        if self._lookahead_executor is None:
+            self._lookahead_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='carlanet-lookahead')
+        self._lookahead = self._lookahead_executor.submit(self._run_lookahead, self._next_lookahead_timestamp)
+        self._next_lookahead_timestamp = None
+
     def GENERIC_MESSAGE(self, message):
-        res = dict()
-        res['message_type'] = 'GENERIC_RESPONSE'
-        sim_status, user_defined_response = self.omnet_world_listener.generic_message(message['timestamp'], message[
-            'user_defined'])
+        sim_status, user_defined_response = self._call_listener('generic_message', message.timestamp,
+                                                                message.user_defined)
+        res = GenericResponseMessage(simulation_status=sim_status.value, user_defined=user_defined_response)
+
+        if sim_status != SimulatorStatus.RUNNING:
+            self._set_finished(sim_status)
+        return res
 
-        res['simulation_status'] = sim_status.value
-        res['user_defined'] = user_defined_response
+    def GENERIC_MESSAGES(self, message):
+        if self._listener_overrides('generic_messages'):
+            sim_status, responses = self._call_listener('generic_messages', message.timestamp,
+                                                        message.user_defined_messages)
+        else:
+            sim_status, responses = SimulatorStatus.RUNNING, []
+            for user_defined_message in message.user_defined_messages:
+                sim_status, response = self._call_listener('generic_message', message.timestamp,
+                                                           user_defined_message)
+                responses.append(response)
+                if sim_status != SimulatorStatus.RUNNING:
+                    break
+        res = GenericResponsesMessage(simulation_status=sim_status.value, user_defined_responses=list(responses))
 
         if sim_status != SimulatorStatus.RUNNING:
-            self._manager.set_message_handler_state(FinishedMessageHandlerState, sim_status)
+            self._set_finished(sim_status)
         return res
 
 
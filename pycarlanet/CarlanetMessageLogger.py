@@ -0,0 +1,114 @@
+import json
+import queue
+import sys
+import threading
+import time
+
+"""
+Log of the messages exchanged with OMNeT++ that doesn't slow down the main loop of the manager.
+The loop only puts a tuple with the fields of the message on a bounded queue, a background thread formats them
+and writes one JSON line per message, e.g.
+    {"time": 1700000000.123, "direction": "recv", "message_type": "SIMULATION_STEP", "timestamp": 1.5, "size": 46}
+    {"time": 1700000000.124, "direction": "send", "message_type": "UPDATED_POSITIONS", "size": 5210, "actors": 40}
+When the queue is full, e.g. because the output is slow, records are dropped instead of blocking the loop.
+A record keeps the bytes of its message only when they are captured, otherwise only their size.
+"""
+
+
+class MessageLogger:
+    STEP = 'SIMULATION_STEP'
+
+    def __init__(self, output=None, step_sampling=1, capture_payloads=False, max_payload_bytes=4096,
+                 queue_size=10000):
+        """
+        :param output: file object or path of the file where the lines are appended, by default stdout
+        :param step_sampling: log every Nth SIMULATION_STEP and its reply, 0 to log only the other messages
+        :param capture_payloads: add to each line the whole message, decoded in the background thread
+        :param max_payload_bytes: payloads bigger than this are not captured, the line has payload_skipped;
+            with queue_size it bounds the memory used by the log
+        :param queue_size: maximum number of records waiting to be written
+        """
+        self._output = output
+        self.step_sampling = step_sampling
+        self.capture_payloads = capture_payloads
+        self.max_payload_bytes = max_payload_bytes
+        self._queue = queue.Queue(queue_size)
+        self._worker: threading.Thread = None
+        self._steps = 0
+        self._reply_sampled = True
+        self.dropped = 0
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _payload(self, data, codec):
+        """:return: size, codec and bytes of the message; the bytes are kept only if they are captured"""
+        size = len(data)
+        if self.capture_payloads and codec is not None and size <= self.max_payload_bytes:
+            return size, codec, data
+        return size, None, None
+
+    def request(self, data: bytes, message_type, timestamp, codec=None):
+        """Called by the manager with each request received, codec is needed only to capture the payload"""
+        if message_type == self.STEP:
+            self._steps += 1
+            self._reply_sampled = self.step_sampling > 0 and self._steps % self.step_sampling == 0
+        else:
+            self._reply_sampled = True
+        if self._reply_sampled:
+            self._put((time.time(), 'recv', message_type, timestamp, None) + self._payload(data, codec))
+
+    def reply(self, data: bytes, message_type, actors=None, codec=None):
+        """Called by the manager with each reply, it's logged if its request was"""
+        if self._reply_sampled:
+            self._put((time.time(), 'send', message_type, None, actors) + self._payload(data, codec))
+
+    def _format(self, record) -> str:
+        wall_time, direction, message_type, timestamp, actors, size, codec, data = record
+        line = {'time': round(wall_time, 6), 'direction': direction, 'message_type': message_type}
+        if timestamp is not None:
+            line['timestamp'] = timestamp
+        line['size'] = size
+        if actors is not None:
+            line['actors'] = actors
+        if codec is not None:
+            line['payload'] = codec.decode(data)
+        elif self.capture_payloads:
+            line['payload_skipped'] = True
+        return json.dumps(line, separators=(',', ':'), default=repr)
+
+    def _write(self, output):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                output.flush()
+                return
+            try:
+                output.write(self._format(record) + '\n')
+            except Exception as e:
+                output.write(json.dumps({'log_error': repr(e)}) + '\n')
+            if self._queue.empty():
+                output.flush()
+
+    def _run(self):
+        if isinstance(self._output, str):
+            with open(self._output, 'a') as output:
+                self._write(output)
+        else:
+            self._write(self._output if self._output is not None else sys.stdout)
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='carlanet-log', daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        """Write the records in the queue and stop the background thread"""
+        if self._worker is None:
+            return
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
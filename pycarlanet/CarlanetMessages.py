@@ -0,0 +1,202 @@
+"""
+Messages of the protocol between pyCARLANeT and OMNeT++.
+Requests are validated once, when they are decoded, and turned into lightweight objects with __slots__,
+so handlers read attributes instead of indexing nested dicts; a malformed request fails with
+MalformedMessageCarlanetError before reaching the handlers.
+Replies are built as objects and turned into dicts only to be encoded; the fields a reply doesn't declare
+(e.g. the ones added by position filters) are kept in its extra dict.
+"""
+
+_NUMBER = (int, float)
+_ANY = (object,)
+
+
+class MalformedMessageCarlanetError(ValueError):
+    def __init__(self, message_type, reason):
+        super().__init__(f'Malformed {message_type} message: {reason}')
+        self.message_type = message_type
+        self.reason = reason
+
+
+def _validate_regions(message_type, regions):
+    """Regions of interest are circles {region_id, center, radius} or rectangles {region_id, min, max}"""
+    for region in regions:
+        if not isinstance(region, dict) or not isinstance(region.get('region_id'), str):
+            raise MalformedMessageCarlanetError(message_type, 'a region of interest must be an object with a region_id')
+        if 'radius' in region:
+            points, size = [region.get('center')], region['radius']
+        else:
+            points, size = [region.get('min'), region.get('max')], 0
+        valid_points = all(isinstance(point, list) and len(point) >= 2 and all(isinstance(c, _NUMBER) for c in point)
+                           for point in points)
+        if not valid_points or not isinstance(size, _NUMBER):
+            raise MalformedMessageCarlanetError(message_type,
+                                                f'region {region["region_id"]} needs center and radius or min and max')
+
+
+class CarlanetMessage:
+    __slots__ = ()
+    message_type: str = None
+    _required = {}  # name: accepted types
+    _optional = {}
+
+    @classmethod
+    def _check(cls, name, value, types):
+        if not isinstance(value, types):
+            expected = ' or '.join(t.__name__ for t in types)
+            raise MalformedMessageCarlanetError(cls.message_type,
+                                                f'field {name} must be {expected}, not {type(value).__name__}')
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        message = cls.__new__(cls)
+        for name, types in cls._required.items():
+            if name not in data:
+                raise MalformedMessageCarlanetError(cls.message_type, f'missing field {name}')
+            cls._check(name, data[name], types)
+            setattr(message, name, data[name])
+        for name, types in cls._optional.items():
+            value = data.get(name)
+            if value is not None:
+                cls._check(name, value, types)
+            setattr(message, name, value)
+        message._validate()
+        return message
+
+    def _validate(self):
+        """Checks on the content of the fields, called once when the message is decoded"""
+        ...
+
+    def to_dict(self) -> dict:
+        """:return: the message as sent on the wire, optional fields that are not set are omitted"""
+        res = {'message_type': self.message_type}
+        for name in self._required:
+            res[name] = getattr(self, name)
+        for name in self._optional:
+            value = getattr(self, name)
+            if value is not None:
+                res[name] = value
+        return res
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()})'
+
+
+class InitMessage(CarlanetMessage):
+    message_type = 'INIT'
+    _required = {'timestamp': _NUMBER, 'run_id': (str,), 'moving_actors': (list,), 'carla_configuration': (dict,),
+                 'user_defined': _ANY}
+    _optional = {'codecs': (list,), 'shared_memory': (bool,), 'multipart': (bool,), 'regions_of_interest': (list,)}
+    __slots__ = tuple(_required) + tuple(_optional)
+
+    def _validate(self):
+        for actor in self.moving_actors:
+            if not isinstance(actor, dict):
+                raise MalformedMessageCarlanetError(self.message_type, 'moving_actors must contain objects')
+            for name, types in (('actor_id', (str,)), ('actor_type', (str,)), ('actor_configuration', (dict,))):
+                if name not in actor:
+                    raise MalformedMessageCarlanetError(self.message_type, f'missing field {name} of a moving actor')
+                self._check(name, actor[name], types)
+        carla_timestep = self.carla_configuration.get('carla_timestep')
+        if carla_timestep is not None:
+            self._check('carla_timestep', carla_timestep, _NUMBER)
+        if self.regions_of_interest is not None:
+            _validate_regions(self.message_type, self.regions_of_interest)
+
+
+class SimulationStepMessage(CarlanetMessage):
+    message_type = 'SIMULATION_STEP'
+    _required = {'timestamp': _NUMBER}
+    __slots__ = tuple(_required)
+
+
+class GenericMessage(CarlanetMessage):
+    message_type = 'GENERIC_MESSAGE'
+    _required = {'timestamp': _NUMBER, 'user_defined': _ANY}
+    _optional = {'regions_of_interest': (list,)}
+    __slots__ = tuple(_required) + tuple(_optional)
+
+    def _validate(self):
+        if self.regions_of_interest is not None:
+            _validate_regions(self.message_type, self.regions_of_interest)
+
+
+class GenericMessages(CarlanetMessage):
+    """Many user defined messages of the same timestamp in a single round trip"""
+    message_type = 'GENERIC_MESSAGES'
+    _required = {'timestamp': _NUMBER, 'user_defined_messages': (list,)}
+    __slots__ = tuple(_required)
+
+
+REQUESTS = {cls.message_type: cls for cls in (InitMessage, SimulationStepMessage, GenericMessage, GenericMessages)}
+
+
+def decode_message(data) -> CarlanetMessage:
+    """:return: the request of OMNeT++ contained in the decoded data, validated"""
+    if not isinstance(data, dict):
+        raise MalformedMessageCarlanetError(None, f'a message must be an object, not {type(data).__name__}')
+    message_type = data.get('message_type')
+    message_cls = REQUESTS.get(message_type)
+    if message_cls is None:
+        raise MalformedMessageCarlanetError(message_type, 'unknown message type')
+    return message_cls.from_dict(data)
+
+
+class CarlanetReply(CarlanetMessage):
+    __slots__ = ('extra',)
+
+    def __init__(self, **fields):
+        for name in self._required:
+            setattr(self, name, fields.pop(name, None))
+        self.extra = fields
+
+    def __setitem__(self, name, value):
+        if name in self._required:
+            setattr(self, name, value)
+        else:
+            self.extra[name] = value
+
+    def __getitem__(self, name):
+        if name in self._required:
+            return getattr(self, name)
+        if name == 'message_type':
+            return self.message_type
+        return self.extra[name]
+
+    def to_dict(self) -> dict:
+        res = super().to_dict()
+        res.update(self.extra)
+        return res
+
+    def actor_count(self):
+        """:return: number of actors whose positions are sent with the reply, None if it doesn't send positions"""
+        for name in ('positions_frame', 'positions_block'):
+            if name in self.extra:
+                return self.extra[name]['count']
+        actor_positions = getattr(self, 'actor_positions', None)
+        return None if actor_positions is None else len(actor_positions)
+
+
+class InitCompletedMessage(CarlanetReply):
+    message_type = 'INIT_COMPLETED'
+    _required = {'initial_timestamp': _NUMBER, 'simulation_status': (int,), 'actor_positions': (list,),
+                 'codec': (str,)}
+    __slots__ = tuple(_required)
+
+
+class UpdatedPositionsMessage(CarlanetReply):
+    message_type = 'UPDATED_POSITIONS'
+    _required = {'simulation_status': (int,), 'actor_positions': (list,)}
+    __slots__ = tuple(_required)
+
+
+class GenericResponseMessage(CarlanetReply):
+    message_type = 'GENERIC_RESPONSE'
+    _required = {'simulation_status': (int,), 'user_defined': _ANY}
+    __slots__ = tuple(_required)
+
+
+class GenericResponsesMessage(CarlanetReply):
+    message_type = 'GENERIC_RESPONSES'
+    _required = {'simulation_status': (int,), 'user_defined_responses': (list,)}
+    __slots__ = tuple(_required)
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import zmq
+
+from pycarlanet.CarlanetStats import Histogram, LATENCY_BUCKETS
+
+"""
+Live metrics of a run, exported while it is in progress.
+The manager updates RunMetrics after each message with a few assignments and a histogram sample; an exporter
+reads them from its own thread, so a scrape never stalls the loop with OMNeT++. The values are read without
+locks: a scrape can see a step half recorded, which is corrected by the next one.
+PrometheusExporter serves them in the Prometheus text format on http://host:port/metrics, ZmqMetricsPublisher
+publishes them as JSON on a PUB socket every interval seconds.
+"""
+
+
+class RunMetrics:
+    STEP = 'SIMULATION_STEP'
+
+    def __init__(self):
+        self.messages = dict()  # message_type: messages handled
+        self.step_duration = Histogram(LATENCY_BUCKETS)
+        self.timestamp = None
+        self.actors = 0
+        self._first_timestamp = self._first_wall_time = None
+
+    def message_handled(self, message_type, timestamp, duration, actors):
+        """Called by the manager after a message is handled, duration is the time spent to handle it [s]"""
+        self.messages[message_type] = self.messages.get(message_type, 0) + 1
+        if message_type == self.STEP:
+            self.step_duration.record(duration)
+        if self._first_wall_time is None:
+            self._first_timestamp, self._first_wall_time = timestamp, time.monotonic()
+        self.timestamp = timestamp
+        self.actors = actors
+
+    def real_time_factor(self) -> float:
+        """:return: simulated seconds per wall-clock second since the first message, 0 before the second one"""
+        if self._first_wall_time is None:
+            return 0.0
+        elapsed = time.monotonic() - self._first_wall_time
+        return (self.timestamp - self._first_timestamp) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        step_duration = self.step_duration.summary()
+        return {
+            'messages': dict(self.messages),
+            'steps': self.messages.get(self.STEP, 0),
+            'step_duration': {name: step_duration[name] for name in ('count', 'mean', 'p50', 'p99', 'max', 'total')},
+            'real_time_factor': self.real_time_factor(),
+            'actors': self.actors,
+            'timestamp': self.timestamp,
+        }
+
+    def to_prometheus(self) -> str:
+        lines = ['# TYPE carlanet_messages_total counter']
+        for message_type, count in list(self.messages.items()):
+            lines.append(f'carlanet_messages_total{{message_type="{message_type}"}} {count}')
+        lines.append('# TYPE carlanet_step_duration_seconds histogram')
+        histogram = self.step_duration
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            lines.append(f'carlanet_step_duration_seconds_bucket{{le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'carlanet_step_duration_seconds_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f'carlanet_step_duration_seconds_sum {histogram.total}')
+        lines.append(f'carlanet_step_duration_seconds_count {histogram.count}')
+        lines += ['# TYPE carlanet_real_time_factor gauge', f'carlanet_real_time_factor {self.real_time_factor()}',
+                  '# TYPE carlanet_actors gauge', f'carlanet_actors {self.actors}']
+        if self.timestamp is not None:
+            lines += ['# TYPE carlanet_simulation_timestamp_seconds gauge',
+                      f'carlanet_simulation_timestamp_seconds {self.timestamp}']
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """Base class of the exporters, the manager attaches its RunMetrics and starts the exporter with each run"""
+
+    def __init__(self):
+        self.metrics = RunMetrics()
+
+    def attach(self, metrics: RunMetrics):
+        self.metrics = metrics
+
+    def start(self):
+        ...
+
+    def stop(self):
+        ...
+
+
+class PrometheusExporter(MetricsExporter):
+    def __init__(self, port=9464, host='127.0.0.1'):
+        """
+        :param port: 0 to let the system choose a free port, read from port once started
+        :param host: by default the metrics are served only on the local machine
+        """
+        super().__init__()
+        self.port = port
+        self.host = host
+        self._server: ThreadingHTTPServer = None
+        self._thread: threading.Thread = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                ...
+
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self.port = self._server.server_address[1]  # The port chosen by the system when port is 0
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='carlanet-metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+
+class ZmqMetricsPublisher(MetricsExporter):
+    TOPIC = b'carlanet.metrics'
+
+    def __init__(self, endpoint='tcp://127.0.0.1:5556', interval=1.0):
+        """Publish the snapshot of the metrics as the frames [TOPIC, JSON] every interval seconds"""
+        super().__init__()
+        self.endpoint = endpoint
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def _publish(self):
+        # ZMQ sockets can't be shared between threads, the socket is owned by the thread of the publisher
+        socket = zmq.Context.instance().socket(zmq.PUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(self.endpoint)
+        try:
+            while not self._stopped.wait(self.interval):
+                socket.send_multipart([self.TOPIC, json.dumps(self.metrics.snapshot()).encode('utf-8')])
+        finally:
+            socket.close()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._publish, name='carlanet-metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
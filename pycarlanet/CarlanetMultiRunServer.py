@@ -0,0 +1,160 @@
+import time
+
+import zmq
+
+from pycarlanet import SimulatorStatus, JsonCodec
+from pycarlanet.CarlanetManager import CarlanetManager, OmnetTimeoutCarlanetError
+
+"""
+Server that hosts many concurrent runs of OMNeT++ in a single process.
+A ROUTER socket receives the messages of all the runs; the first message of each peer must be INIT, whose run_id
+is used to create an independent CarlanetManager (with its own state machine, world and actor registry),
+then the messages of the peer are routed to it.
+Messages are handled one at a time, so the callbacks of a run delay the other runs: the server is meant for
+light-weight runs that don't need one process each.
+The recv_timeout of each manager is applied to its run: the server waits at most until the first deadline of the
+runs in progress, and a run whose OMNeT++ doesn't send the next message in time is ended with
+OmnetTimeoutCarlanetError, without affecting the others.
+"""
+
+
+class CarlanetMultiRunServer:
+    def __init__(self, listening_port, manager_factory, socket_options=None, max_runs=None):
+        """
+        :param manager_factory: called with the run_id of each new run, it returns the CarlanetManager that handles it,
+            e.g. lambda run_id: CarlanetManager(None, MyListener(run_id)); the listening port of the manager isn't used
+        :param max_runs: the server stops after this number of runs is ended, None to serve forever
+        """
+        self._listening_port = listening_port
+        self._manager_factory = manager_factory
+        self.socket_options = socket_options if socket_options else {}
+        self._max_runs = max_runs
+        self._handshake_codec = JsonCodec()
+        self._runs = dict()
+        self._run_ids = dict()
+        self._last_answers = dict()  # peer: time.monotonic() when the last answer was sent to it
+        self._ended_runs = 0
+
+    @property
+    def active_runs(self):
+        """run_id of the runs in progress"""
+        return list(self._run_ids.values())
+
+    def _start_server(self):
+        context = zmq.Context()
+        for opt_name, opt_value in self.socket_options.items():
+            context.setsockopt(opt_name, opt_value)
+        self.socket = context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.LINGER, 100)
+        self.socket.bind(f"tcp://*:{self._listening_port}")
+        print("server running")
+
+    def _create_run(self, peer, message):
+        msg = self._handshake_codec.decode(message)
+        if msg['message_type'] != 'INIT':
+            raise RuntimeError(f"The first message of a run must be INIT, received {msg['message_type']}")
+        run_id = msg['run_id']
+        if run_id in self._run_ids.values():
+            raise RuntimeError(f'The run {run_id} is already in progress')
+        manager: CarlanetManager = self._manager_factory(run_id)
+        manager._start_run()
+        self._runs[peer], self._run_ids[peer] = manager, run_id
+        return manager
+
+    def _end_run(self, peer):
+        self._runs.pop(peer)._end_run()
+        self._run_ids.pop(peer)
+        self._last_answers.pop(peer, None)
+        self._ended_runs += 1
+
+    def _is_server_finished(self):
+        return self._max_runs is not None and self._ended_runs >= self._max_runs and not self._runs
+
+    def _handle_message(self, peer, message):
+        manager = self._runs.get(peer)
+        try:
+            if manager is None:
+                manager = self._create_run(peer, message)
+            answer = manager._handle_raw_message(message)
+        except Exception as e:
+            # Only the run that failed is ended, its peer receives an error status
+            if manager is not None:
+                manager._invoke_listener('simulation_error', e)
+                self._end_run(peer)
+            codec = manager._codec if manager is not None else self._handshake_codec
+            return [codec.encode({'message_type': 'ERROR', 'simulation_status': SimulatorStatus.FINISHED_ERROR.value})]
+        return answer
+
+    def _handle_bad_envelope(self, frames):
+        """A message that isn't a REQ envelope with a single frame ends only the run of its peer, if any"""
+        error = ValueError(f'Expected a REQ envelope [peer, empty delimiter, message], received {len(frames)} frames')
+        peer = frames[0]
+        manager = self._runs.get(peer)
+        if manager is None:
+            print(f'Discarded a message of an unknown peer: {error}')
+            return
+        manager._invoke_listener('simulation_error', error)
+        self._end_run(peer)
+
+    def _idle_time(self, peer, now):
+        """:return: time elapsed since the last answer sent to the peer [ms]"""
+        return (now - self._last_answers.get(peer, now)) * 1000
+
+    def _poll_timeout(self):
+        """:return: wait until the first deadline of the runs in progress [ms], None to wait forever"""
+        now, timeout = time.monotonic(), None
+        for peer, manager in self._runs.items():
+            deadline = manager._recv_deadline()
+            if deadline is not None:
+                remaining = max(0, deadline - self._idle_time(peer, now))
+                timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def _end_expired_runs(self):
+        """The runs whose OMNeT++ didn't send the next message within their recv_timeout are ended"""
+        now = time.monotonic()
+        for peer, manager in list(self._runs.items()):
+            deadline = manager._recv_deadline()
+            if deadline is not None and self._idle_time(peer, now) >= deadline:
+                manager._invoke_listener('simulation_error',
+                                         OmnetTimeoutCarlanetError(manager._recv_timeout, manager.timestamp))
+                self._end_run(peer)
+
+    def _answer_sent(self, peer):
+        manager = self._runs.get(peer)
+        if manager is None:
+            return
+        self._last_answers[peer] = time.monotonic()
+        manager._answer_sent()
+        if manager._is_simulation_finished():
+            self._end_run(peer)
+            manager._simulation_finished()
+
+    def start_server(self):
+        self._start_server()
+        try:
+            while not self._is_server_finished():
+                timeout = self._poll_timeout()
+                if timeout is not None and not self.socket.poll(timeout):
+                    self._end_expired_runs()
+                    continue
+                frames = self.socket.recv_multipart()
+                if len(frames) != 3 or frames[1] != b'':
+                    self._handle_bad_envelope(frames)
+                    continue
+                peer, empty, message = frames
+                answer = self._handle_message(peer, message)
+                # The answer can have many frames, e.g. with a multipart transport
+                self.socket.send_multipart([peer, empty] + answer, copy=False)
+                self._answer_sent(peer)
+                # Also the runs that expired while the others kept the server busy
+                self._end_expired_runs()
+        except Exception as e:
+            for manager in self._runs.values():
+                manager._invoke_listener('simulation_error', e)
+            raise
+        finally:
+            # The runs still in progress release their resources (threads, shared memory, recorder)
+            for peer in list(self._runs):
+                self._end_run(peer)
+            self.socket.close()
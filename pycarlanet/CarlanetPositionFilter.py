@@ -0,0 +1,330 @@
+import abc
+
+import numpy as np
+
+from pycarlanet import CarlanetActorRegistry
+
+"""
+Filters applied to the actor positions sent to OMNeT++ in INIT_COMPLETED and UPDATED_POSITIONS.
+A filter works on the columns of the actor registry: it receives the mask of the actors selected by the previous
+filters, returns the mask of the actors to send and can add fields to the reply.
+"""
+
+
+class PositionFilter(abc.ABC):
+
+    def attach(self, registry: CarlanetActorRegistry):
+        """Called once by the manager, here the filter can add its own columns to the registry"""
+        ...
+
+    def reset(self):
+        """Called at INIT, when OMNeT++ doesn't know any actor"""
+        ...
+
+    def message_received(self, message):
+        """Called with each message of OMNeT++ before it's handled, e.g. to read the configuration of the filter"""
+        ...
+
+    @abc.abstractmethod
+    def filter(self, registry: CarlanetActorRegistry, selected: np.ndarray, res: dict) -> np.ndarray:
+        """
+        :param registry: actor registry, already updated to the current step
+        :param selected: boolean mask of the slots selected by the previous filters
+        :param res: reply that will be sent to OMNeT++
+        :return: boolean mask of the slots to send
+        """
+        ...
+
+
+class DeltaPositionFilter(PositionFilter):
+    """
+    Send only the actors whose pose, velocity or activeness changed more than an epsilon since the last step
+    acknowledged by OMNeT++ (in REQ/REP each request acknowledges the previous reply).
+    Every keyframe_interval steps all the actors are sent.
+    The reply contains:
+    - delta_encoded: always True
+    - keyframe: True if actor_positions contains all the actors
+    - removed_actors: ids of the actors removed since the last step, always empty in a keyframe
+    """
+    _LAST_SENT_COLUMNS = {
+        CarlanetActorRegistry.POSITION: 'delta_last_position',
+        CarlanetActorRegistry.ROTATION: 'delta_last_rotation',
+        CarlanetActorRegistry.VELOCITY: 'delta_last_velocity'
+    }
+    _LAST_ALIVE = 'delta_last_alive'
+    _KNOWN = 'delta_known'
+
+    def __init__(self, position_epsilon=0.01, rotation_epsilon=0.1, velocity_epsilon=0.01, keyframe_interval=100):
+        """
+        :param position_epsilon: [m]
+        :param rotation_epsilon: [deg]
+        :param velocity_epsilon: [m/s]
+        :param keyframe_interval: number of steps between two keyframes, None to send only the first keyframe
+        """
+        self._epsilons = {
+            CarlanetActorRegistry.POSITION: position_epsilon,
+            CarlanetActorRegistry.ROTATION: rotation_epsilon,
+            CarlanetActorRegistry.VELOCITY: velocity_epsilon
+        }
+        self._keyframe_interval = keyframe_interval
+        self._steps_from_keyframe = None
+        self._removed_actors = []
+        self._registry: CarlanetActorRegistry = None
+
+    def attach(self, registry: CarlanetActorRegistry):
+        self._registry = registry
+        for column in self._LAST_SENT_COLUMNS.values():
+            registry.add_column(column, (3,))
+        registry.add_column(self._LAST_ALIVE, dtype=bool, fill_value=False)
+        registry.add_column(self._KNOWN, dtype=bool, fill_value=False)
+        registry.add_remove_listener(self._on_actor_removed)
+
+    def _on_actor_removed(self, actor_id, slot):
+        if self._registry.column(self._KNOWN)[slot]:
+            self._removed_actors.append(actor_id)
+
+    def reset(self):
+        self._steps_from_keyframe = None
+        self._removed_actors = []
+
+    def _is_keyframe(self):
+        return self._steps_from_keyframe is None or (
+                self._keyframe_interval is not None and self._steps_from_keyframe >= self._keyframe_interval)
+
+    def filter(self, registry: CarlanetActorRegistry, selected: np.ndarray, res: dict) -> np.ndarray:
+        known = registry.column(self._KNOWN, writable=True)
+        last_alive = registry.column(self._LAST_ALIVE, writable=True)
+        alive = registry.alive
+
+        res['delta_encoded'] = True
+        res['keyframe'] = self._is_keyframe()
+        if res['keyframe']:
+            self._steps_from_keyframe = 0
+            self._removed_actors = []
+            to_send = selected.copy()
+            known[:] = to_send
+        else:
+            self._steps_from_keyframe += 1
+            changed = ~known | (alive != last_alive)
+            for column, last_sent_column in self._LAST_SENT_COLUMNS.items():
+                difference = np.abs(registry.column(column) - registry.column(last_sent_column))
+                changed |= (difference > self._epsilons[column]).any(axis=1)
+            to_send = selected & changed
+            known |= to_send
+
+        res['removed_actors'] = self._removed_actors
+        self._removed_actors = []
+        for column, last_sent_column in self._LAST_SENT_COLUMNS.items():
+            registry.column(last_sent_column, writable=True)[to_send] = registry.column(column)[to_send]
+        last_alive[to_send] = alive[to_send]
+        return to_send
+
+
+class RegionOfInterestFilter(PositionFilter):
+    """
+    Send only the actors inside the regions of interest declared by OMNeT++ on the x, y plane, circles
+    {region_id, center: [x, y], radius} or rectangles {region_id, min: [x, y], max: [x, y]}.
+    Regions are declared in the field regions_of_interest of INIT or of a GENERIC_MESSAGE, which replaces them;
+    until OMNeT++ declares them all the actors are sent.
+    Actors are indexed in a grid of square cells sorted by cell, so the cost of a region depends on the actors
+    around it and not on the size of the world.
+    The reply contains roi_entered and roi_left, {region_id: [actor ids]} of the actors that entered or left each
+    region since the previous step; removed actors leave their regions, removed regions don't notify.
+    When combined with DeltaPositionFilter, this filter must come first.
+    """
+    _MEMBERSHIP = 'roi_membership'  # Bit mask of the regions containing the actor
+    MAX_REGIONS = 63
+
+    def __init__(self, cell_size=50.0):
+        """:param cell_size: side of the cells of the grid [m], in the order of the size of the regions"""
+        self._cell_size = cell_size
+        self._regions = None
+        self._bits = dict()
+        self._removed_left = dict()
+        self._registry: CarlanetActorRegistry = None
+
+    def attach(self, registry: CarlanetActorRegistry):
+        self._registry = registry
+        registry.add_column(self._MEMBERSHIP, dtype=np.int64, fill_value=0)
+        registry.add_remove_listener(self._on_actor_removed)
+
+    def _on_actor_removed(self, actor_id, slot):
+        membership = int(self._registry.column(self._MEMBERSHIP)[slot])
+        for region_id, bit in self._bits.items():
+            if membership >> bit & 1:
+                self._removed_left.setdefault(region_id, []).append(actor_id)
+
+    def reset(self):
+        self._registry.column(self._MEMBERSHIP, writable=True)[:] = 0
+        self._removed_left = dict()
+
+    def message_received(self, message):
+        regions = getattr(message, 'regions_of_interest', None)
+        if regions is not None or message.message_type == 'INIT':
+            self.set_regions(regions)
+
+    def set_regions(self, regions):
+        """:param regions: regions of interest in the format of the messages, None to send all the actors"""
+        membership = self._registry.column(self._MEMBERSHIP, writable=True)
+        if regions is None:
+            self._regions, self._bits = None, dict()
+            membership[:] = 0
+            return
+        if len(regions) > self.MAX_REGIONS:
+            raise ValueError(f'At most {self.MAX_REGIONS} regions of interest are supported')
+        region_ids = {region['region_id'] for region in regions}
+        for region_id in [region_id for region_id in self._bits if region_id not in region_ids]:
+            membership &= ~(1 << self._bits.pop(region_id))
+        free_bits = sorted(set(range(self.MAX_REGIONS)) - set(self._bits.values()))
+        self._regions = []
+        for region in regions:
+            if region['region_id'] not in self._bits:
+                self._bits[region['region_id']] = free_bits.pop(0)
+            if 'radius' in region:
+                (x, y), radius = region['center'][:2], region['radius']
+                bounds, circle = (x - radius, y - radius, x + radius, y + radius), (x, y, radius)
+            else:
+                bounds, circle = (*region['min'][:2], *region['max'][:2]), None
+            self._regions.append((self._bits[region['region_id']], region['region_id'], bounds, circle))
+
+    def _cell(self, coordinate):
+        # Cells are shifted to be non-negative, the key of a cell is x << 32 | y
+        return np.floor(np.asarray(coordinate) / self._cell_size).astype(np.int64) + (1 << 30)
+
+    def _memberships(self, positions) -> np.ndarray:
+        cells = self._cell(positions[:, :2])
+        keys = cells[:, 0] << 32 | cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        memberships = np.zeros(len(positions), dtype=np.int64)
+        for bit, _, (min_x, min_y, max_x, max_y), circle in self._regions:
+            min_cell_y, max_cell_y = int(self._cell(min_y)), int(self._cell(max_y))
+            candidates = []
+            for cell_x in range(int(self._cell(min_x)), int(self._cell(max_x)) + 1):
+                # The keys of a column of cells are contiguous
+                first = np.searchsorted(sorted_keys, cell_x << 32 | min_cell_y, side='left')
+                last = np.searchsorted(sorted_keys, cell_x << 32 | max_cell_y, side='right')
+                candidates.append(order[first:last])
+            candidates = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.int64)
+            x, y = positions[candidates, 0], positions[candidates, 1]
+            if circle is not None:
+                inside = (x - circle[0]) ** 2 + (y - circle[1]) ** 2 <= circle[2] ** 2
+            else:
+                inside = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+            memberships[candidates[inside]] |= 1 << bit
+        return memberships
+
+    def _notifications(self, changes, ids) -> dict:
+        notifications = dict()
+        if changes.any():
+            for region_id, bit in self._bits.items():
+                slots = np.flatnonzero(changes >> bit & 1)
+                if len(slots):
+                    notifications[region_id] = [ids[slot] for slot in slots.tolist()]
+        return notifications
+
+    def filter(self, registry: CarlanetActorRegistry, selected: np.ndarray, res: dict) -> np.ndarray:
+        if self._regions is None:
+            return selected
+        membership = registry.column(self._MEMBERSHIP, writable=True)
+        current = self._memberships(registry.positions)
+        ids = registry.ids
+        res['roi_entered'] = self._notifications(current & ~membership, ids)
+        left = self._notifications(membership & ~current, ids)
+        for region_id, actor_ids in self._removed_left.items():
+            if region_id in self._bits:
+                left.setdefault(region_id, []).extend(actor_ids)
+        res['roi_left'] = left
+        self._removed_left = dict()
+        membership[:] = current
+        return selected & (current != 0)
+
+
+class DeadReckoningFilter(PositionFilter):
+    """
+    Send an actor only when its pose differs more than an error bound from the one OMNeT++ extrapolates from the
+    last position, velocity and rotation sent: position + velocity * elapsed time, with constant rotation.
+    The time is the one of the world snapshot the registry was updated with.
+    The reply contains:
+    - dead_reckoning: always True, OMNeT++ keeps extrapolating the actors that are not sent
+    - removed_actors: ids of the actors removed since the last step
+    """
+    _POSITION = 'dr_position'
+    _ROTATION = 'dr_rotation'
+    _VELOCITY = 'dr_velocity'
+    _TIME = 'dr_time'
+    _ALIVE = 'dr_alive'
+    _KNOWN = 'dr_known'
+    _ERROR_BOUND = 'dr_error_bound'  # NaN for the actors that use the default bound
+
+    def __init__(self, position_error=0.5, rotation_error=5.0, max_interval=None):
+        """
+        :param position_error: default bound of the distance between the true and the extrapolated position [m]
+        :param rotation_error: bound of the difference of each angle from the last rotation sent [deg]
+        :param max_interval: maximum time between two updates of an actor [s], None to send only on errors
+        """
+        self._position_error = position_error
+        self._rotation_error = rotation_error
+        self._max_interval = max_interval
+        self._error_bounds = dict()
+        self._removed_actors = []
+        self._registry: CarlanetActorRegistry = None
+
+    def attach(self, registry: CarlanetActorRegistry):
+        self._registry = registry
+        for column in [self._POSITION, self._ROTATION, self._VELOCITY]:
+            registry.add_column(column, (3,))
+        registry.add_column(self._TIME)
+        registry.add_column(self._ALIVE, dtype=bool, fill_value=False)
+        registry.add_column(self._KNOWN, dtype=bool, fill_value=False)
+        registry.add_column(self._ERROR_BOUND, fill_value=np.nan)
+        registry.add_remove_listener(self._on_actor_removed)
+
+    def _on_actor_removed(self, actor_id, slot):
+        if self._registry.column(self._KNOWN)[slot]:
+            self._removed_actors.append(actor_id)
+
+    def set_error_bound(self, actor_id, position_error):
+        """Bound of the position error of a single actor [m], it can be set before the actor is created"""
+        self._error_bounds[actor_id] = position_error
+
+    def reset(self):
+        self._registry.column(self._KNOWN, writable=True)[:] = False
+        self._removed_actors = []
+
+    def _error_bound_column(self, registry: CarlanetActorRegistry) -> np.ndarray:
+        error_bound = registry.column(self._ERROR_BOUND, writable=True)
+        if self._error_bounds:
+            pending = dict()
+            for actor_id, position_error in self._error_bounds.items():
+                if actor_id in registry:
+                    error_bound[registry.slot(actor_id)] = position_error
+                else:
+                    pending[actor_id] = position_error
+            self._error_bounds = pending
+        return np.where(np.isnan(error_bound), self._position_error, error_bound)
+
+    def filter(self, registry: CarlanetActorRegistry, selected: np.ndarray, res: dict) -> np.ndarray:
+        known = registry.column(self._KNOWN, writable=True)
+        last_time = registry.column(self._TIME, writable=True)
+        elapsed = registry.timestamp - last_time if registry.timestamp is not None else np.zeros(len(registry))
+        extrapolated = registry.column(self._POSITION) + registry.column(self._VELOCITY) * elapsed[:, None]
+        position_error = np.linalg.norm(registry.positions - extrapolated, axis=1)
+        rotation_error = np.abs((registry.rotations - registry.column(self._ROTATION) + 180) % 360 - 180).max(axis=1)
+
+        to_send = ~known | (registry.alive != registry.column(self._ALIVE)) | \
+            (position_error > self._error_bound_column(registry)) | (rotation_error > self._rotation_error)
+        if self._max_interval is not None:
+            to_send |= elapsed >= self._max_interval
+        to_send &= selected
+
+        res['dead_reckoning'] = True
+        res['removed_actors'] = self._removed_actors
+        self._removed_actors = []
+        known |= to_send
+        for column, state in [(self._POSITION, registry.positions), (self._ROTATION, registry.rotations),
+                              (self._VELOCITY, registry.velocities), (self._ALIVE, registry.alive)]:
+            registry.column(column, writable=True)[to_send] = state[to_send]
+        if registry.timestamp is not None:
+            last_time[to_send] = registry.timestamp
+        return to_send
@@ -0,0 +1,59 @@
+import struct
+
+"""
+Record of a session: append-only binary log of the messages exchanged with OMNeT++, as they were on the wire.
+The file starts with MAGIC, then each record is: kind (1 byte), length of the payload (uint32, little endian), payload.
+Kinds:
+- REQUEST: message received from OMNeT++
+- REPLY: answer sent to OMNeT++
+- FRAME: further frame of the previous REPLY, when it was sent as a multipart message (e.g. the positions frame)
+- CODEC: name of the codec used for the following messages, written when the codec negotiated at INIT is applied
+"""
+
+MAGIC = b'CARLANET-REC\x01'
+REQUEST = b'Q'
+REPLY = b'R'
+CODEC = b'C'
+FRAME = b'F'
+_HEADER = struct.Struct('<cI')
+
+
+class SessionRecorder:
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+
+    def _write(self, kind, payload):
+        self._file.write(_HEADER.pack(kind, len(payload)))
+        self._file.write(payload)
+
+    def record_request(self, message: bytes):
+        self._write(REQUEST, message)
+
+    def record_reply(self, message: bytes, *frames):
+        """:param frames: the frames sent after message in the same multipart reply"""
+        self._write(REPLY, message)
+        for frame in frames:
+            self._write(FRAME, frame)
+
+    def record_codec(self, codec_name: str):
+        self._write(CODEC, codec_name.encode('utf-8'))
+
+    def close(self):
+        self._file.close()
+
+
+def read_session(path):
+    """:return: iterator of (kind, payload) of the records of the session"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a session recorded by pycarlanet')
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            kind, length = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                raise ValueError(f'Truncated record in {path}')
+            yield kind, payload
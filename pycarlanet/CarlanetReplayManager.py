@@ -0,0 +1,71 @@
+import warnings
+
+from pycarlanet import codec_by_name, JsonCodec, TcpTransport
+from pycarlanet import CarlanetRecorder
+from pycarlanet.CarlanetManager import CarlanetManager
+
+"""
+Replay of a session recorded with CarlanetManager(record_path=...): the recorded replies are served to OMNeT++
+without CARLA, so iterations that change only the network can run as fast as OMNeT++.
+Each request received is checked against the recorded one.
+"""
+
+
+class ReplayMismatchCarlanetError(RuntimeError):
+    def __init__(self, index, expected, received):
+        super().__init__(f'Request {index} differs from the recorded one: expected {expected}, received {received}')
+        self.index = index
+        self.expected = expected
+        self.received = received
+
+
+class CarlanetReplayManager(CarlanetManager):
+    def __init__(self, listening_port, record_path, strict=True, socket_options=None, log_messages=False):
+        """
+        :param strict: if True a request different from the recorded one ends the replay with
+            ReplayMismatchCarlanetError, otherwise a warning is emitted and the recorded reply is sent anyway
+        """
+        # A multipart transport only to create a socket that can send the replies recorded as multipart messages
+        super().__init__(listening_port, None, socket_options=socket_options, log_messages=log_messages,
+                         collect_stats=False, transport=TcpTransport(listening_port, multipart=True))
+        self._record_path = record_path
+        self._strict = strict
+
+    def _check_request(self, index, recorded, received):
+        expected, message = self._codec.decode(recorded), self._codec.decode(received)
+        if self._logger is not None:
+            fields = message if isinstance(message, dict) else {}
+            self._logger.request(received, fields.get('message_type'), fields.get('timestamp'), self._codec)
+        if expected != message:
+            if self._strict:
+                raise ReplayMismatchCarlanetError(index, expected, message)
+            warnings.warn(str(ReplayMismatchCarlanetError(index, expected, message)))
+
+    def start_simulation(self):
+        self._start_server()
+        self._codec = JsonCodec()
+        if self._logger is not None:
+            self._logger.start()
+        try:
+            requests = 0
+            reply = []  # Frames of the reply, sent once all the FRAME records that follow it are read
+            for kind, payload in CarlanetRecorder.read_session(self._record_path):
+                if kind == CarlanetRecorder.FRAME:
+                    reply.append(payload)
+                    continue
+                if reply:
+                    self.socket.send_multipart(reply)
+                    reply = []
+                if kind == CarlanetRecorder.CODEC:
+                    self._codec = codec_by_name(payload.decode('utf-8'))
+                elif kind == CarlanetRecorder.REQUEST:
+                    self._check_request(requests, payload, self.socket.recv())
+                    requests += 1
+                elif kind == CarlanetRecorder.REPLY:
+                    reply = [payload]
+            if reply:
+                self.socket.send_multipart(reply)
+        finally:
+            if self._logger is not None:
+                self._logger.stop()
+            self.socket.close()
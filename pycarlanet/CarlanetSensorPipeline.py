@@ -0,0 +1,182 @@
+import collections
+import threading
+
+import numpy as np
+
+"""
+Pipeline of the data of the sensors, so that their processing doesn't lengthen the steps served to OMNeT++.
+The listen callback of each sensor only copies the data into a ring of preallocated slots, then a worker thread
+passes the new frames to the consumer of the sensor (e.g. to convert or render an image).
+When the consumer is slower than the sensor, the oldest frames not yet consumed are dropped, so the worker
+always works on recent data and the memory never grows.
+The listener can read the latest frame of a sensor at any time with latest(), which returns a read-only view
+of its slot, without copying it.
+"""
+
+SensorFrame = collections.namedtuple('SensorFrame', ['sequence', 'frame', 'timestamp', 'data'])
+
+
+def extract_raw_data(sensor_data, dtype, shape) -> np.ndarray:
+    """Default extraction of the data of a sensor, e.g. the BGRA pixels of a carla.Image with shape (h, w, 4)"""
+    return np.frombuffer(sensor_data.raw_data, dtype=dtype).reshape(shape)
+
+
+class SensorRingBuffer:
+    def __init__(self, shape, dtype=np.uint8, capacity=4, condition: threading.Condition = None):
+        """
+        :param shape: shape of the data of a frame, e.g. (height, width, 4) for a camera
+        :param capacity: number of slots, at least 2: the slot of the frame being consumed is never overwritten
+        :param condition: notified when a frame is pushed, shared by the buffers of a SensorPipeline
+        """
+        if capacity < 2:
+            raise ValueError('A sensor ring buffer needs at least 2 slots')
+        self.capacity = capacity
+        self._data = np.zeros((capacity,) + tuple(shape), dtype=dtype)
+        self._sequences = np.full(capacity, -1, dtype=np.int64)  # -1 for the empty slots
+        self._frames = np.full(capacity, -1, dtype=np.int64)
+        self._timestamps = np.full(capacity, np.nan)
+        self._condition = condition if condition is not None else threading.Condition()
+        self._written = 0  # Sequence of the next frame pushed
+        self._consumed = 0  # Sequence of the next frame to consume
+        self._in_use = None  # Slot of the frame being consumed
+        self.dropped = 0
+
+    def __len__(self):
+        """:return: number of frames not yet consumed"""
+        return self._written - self._consumed
+
+    @property
+    def received(self):
+        return self._written
+
+    def push(self, frame, timestamp, data):
+        """Copy the data into the oldest slot, dropping the oldest frame not consumed if the ring is full"""
+        with self._condition:
+            slot = min((slot for slot in range(self.capacity) if slot != self._in_use),
+                       key=self._sequences.__getitem__)
+            if self._sequences[slot] >= self._consumed:
+                self._consumed = self._sequences[slot] + 1
+                self.dropped += 1
+            self._data[slot] = data
+            self._sequences[slot], self._frames[slot], self._timestamps[slot] = self._written, frame, timestamp
+            self._written += 1
+            self._condition.notify_all()
+
+    def _view(self, slot) -> SensorFrame:
+        view = self._data[slot]
+        view.flags.writeable = False
+        return SensorFrame(int(self._sequences[slot]), int(self._frames[slot]), float(self._timestamps[slot]), view)
+
+    def pop(self) -> SensorFrame:
+        """:return: the oldest frame not consumed, None if there are none; its slot is kept until the next pop"""
+        with self._condition:
+            self._in_use = None
+            if self._written == self._consumed:
+                return None
+            self._in_use = int(np.flatnonzero(self._sequences == self._consumed)[0])
+            self._consumed += 1
+            return self._view(self._in_use)
+
+    def latest(self, timestamp=None) -> SensorFrame:
+        """
+        :param timestamp: sensor timestamp, None for the newest frame
+        :return: the newest frame taken at or before timestamp, None if the ring doesn't have one.
+            The data is a view on the slot, valid until about capacity - 1 newer frames are pushed, see is_valid
+        """
+        with self._condition:
+            best = None
+            for slot in range(self.capacity):
+                sequence = self._sequences[slot]
+                if sequence < 0 or (timestamp is not None and self._timestamps[slot] > timestamp):
+                    continue
+                if best is None or sequence > self._sequences[best]:
+                    best = slot
+            return None if best is None else self._view(best)
+
+    def is_valid(self, sensor_frame: SensorFrame) -> bool:
+        """:return: True if the slot of the frame wasn't overwritten yet"""
+        return sensor_frame.sequence in self._sequences
+
+
+class SensorPipeline:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._buffers = dict()
+        self._sensors = dict()
+        self._consumers = dict()
+        self._worker: threading.Thread = None
+        self._running = False
+
+    def attach(self, name, sensor, shape, dtype=np.uint8, capacity=4, consumer=None, extract=extract_raw_data) \
+            -> SensorRingBuffer:
+        """
+        Start listening to a sensor
+        :param name: name used to read the frames of the sensor
+        :param sensor: carla.Sensor
+        :param shape: shape of the data of a frame, e.g. (height, width, 4) for a camera
+        :param consumer: called by the worker thread with (name, SensorFrame) for each frame not dropped
+        :param extract: called by the thread of CARLA with (sensor_data, dtype, shape), it returns the array
+            copied into the ring
+        """
+        if name in self._buffers:
+            raise ValueError(f'A sensor named {name} is already attached')
+        ring = SensorRingBuffer(shape, dtype, capacity, self._condition)
+        self._buffers[name], self._sensors[name] = ring, sensor
+        if consumer is not None:
+            self._consumers[name] = consumer
+        sensor.listen(lambda sensor_data: ring.push(sensor_data.frame, sensor_data.timestamp,
+                                                    extract(sensor_data, dtype, shape)))
+        return ring
+
+    def buffer(self, name) -> SensorRingBuffer:
+        return self._buffers[name]
+
+    def latest(self, name, timestamp=None) -> SensorFrame:
+        """:return: the newest frame of the sensor taken at or before timestamp, see SensorRingBuffer.latest"""
+        return self._buffers[name].latest(timestamp)
+
+    def counters(self) -> dict:
+        """:return: frames received and dropped of each sensor"""
+        res = dict()
+        for name, ring in self._buffers.items():
+            res[f'{name}.received'], res[f'{name}.dropped'] = ring.received, ring.dropped
+        return res
+
+    def start(self):
+        """Start the worker thread that passes the frames to the consumers"""
+        if self._worker is not None:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._consume, name='carlanet-sensors', daemon=True)
+        self._worker.start()
+
+    def _next_frames(self) -> list:
+        with self._condition:
+            while True:
+                frames = [(name, self._buffers[name].pop()) for name in self._consumers]
+                frames = [(name, frame) for name, frame in frames if frame is not None]
+                if frames or not self._running:
+                    return frames
+                self._condition.wait()
+
+    def _consume(self):
+        while True:
+            frames = self._next_frames()
+            if not frames:
+                return
+            for name, frame in frames:
+                try:
+                    self._consumers[name](name, frame)
+                except Exception as e:
+                    print(f'Consumer of the sensor {name} failed: {e!r}')
+
+    def stop(self):
+        """Stop listening to the sensors, then the worker thread once it has consumed the frames received"""
+        for sensor in self._sensors.values():
+            sensor.stop()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
@@ -0,0 +1,117 @@
+import bisect
+import json
+
+"""
+Low-overhead statistics of the main loop of the manager: each phase has a histogram with fixed buckets,
+so recording a sample costs a binary search and a few additions, without storing the samples.
+"""
+
+# Upper bounds of the buckets [s], 4 buckets per decade from 1us to 100s
+LATENCY_BUCKETS = tuple(10 ** (exponent / 4) for exponent in range(-24, 9))
+# Upper bounds of the buckets of the sizes, e.g. the number of queued commands
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # The last bucket counts the samples over the last bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """:return: upper bound of the bucket containing the percentile, the maximum for the last bucket"""
+        if not self.count:
+            return 0.0
+        threshold = self.count * percentile / 100
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'total': self.total,
+            # [upper bound, count] of the non-empty buckets, the bound of the last bucket is None
+            'buckets': [[bound, count] for bound, count in zip(self.bounds + (None,), self.counts) if count]
+        }
+
+
+class CarlanetStats:
+    """Latency histograms of the phases of the manager, durations are in seconds"""
+    RECV_WAIT = 'recv_wait'
+    DECODE = 'decode'
+    WORLD_TICK = 'world_tick'
+    POSITIONS_UPDATE = 'positions.update'
+    POSITIONS_SERIALIZE = 'positions.serialize'
+    ENCODE = 'encode'
+    SEND = 'send'
+    LISTENER = 'listener.'  # Prefix of the phases of the callbacks, e.g. listener.carla_simulation_step
+    COUNTERS = 'counters'  # Key of the counters in the summary
+    ACTOR_CACHE = 'actor_cache.'  # Prefix of the counters of ActorQueryCache, hits and misses of the run
+    BYTES_COPIED = 'send.bytes_copied'  # Bytes of the replies copied by ZMQ
+    BUFFER_ALLOCATIONS = 'send.buffer_allocations'  # Allocations of the buffer of the positions frame
+    GC_COLLECTIONS = 'gc.collections'  # Collections of the garbage collector since the creation of the manager
+    COMMAND_QUEUE_DEPTH = 'commands.queue_depth'  # Commands queued before each tick, in COUNT_BUCKETS
+    COMMAND_FLUSH = 'commands.flush'
+    LOG_DROPPED = 'log.dropped'  # Messages not logged because the queue of the MessageLogger was full
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = dict()
+        self._counters = dict()
+
+    def histogram(self, phase, bounds=LATENCY_BUCKETS) -> Histogram:
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            histogram = self._histograms[phase] = Histogram(bounds)
+        return histogram
+
+    def record(self, phase, value, bounds=LATENCY_BUCKETS):
+        if self.enabled:
+            self.histogram(phase, bounds).record(value)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_counter(self, name, value):
+        if self.enabled:
+            self._counters[name] = value
+
+    def summary(self) -> dict:
+        summary = {phase: histogram.summary() for phase, histogram in self._histograms.items()}
+        if self._counters:
+            summary[self.COUNTERS] = dict(self._counters)
+        return summary
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary())
+
+    def format(self) -> str:
+        lines = [f'{"phase":<40} {"count":>8} {"mean":>10} {"p50":>10} {"p99":>10} {"max":>10} unit']
+        for phase, histogram in sorted(self._histograms.items()):
+            summary = histogram.summary()
+            # Durations are printed in milliseconds, the other histograms as they are
+            scale, unit = (1e3, 'ms') if histogram.bounds == LATENCY_BUCKETS else (1, '')
+            lines.append(f'{phase:<40} {summary["count"]:>8} {summary["mean"] * scale:>10.3f} '
+                         f'{summary["p50"] * scale:>10.3f} {summary["p99"] * scale:>10.3f} '
+                         f'{summary["max"] * scale:>10.3f} {unit}')
+        for name, value in sorted(self._counters.items()):
+            lines.append(f'{name:<40} {value:>8}')
+        return '\n'.join(lines)
@@ -0,0 +1,259 @@
+import itertools
+import os
+import struct
+
+import numpy as np
+
+from pycarlanet import CarlanetStats
+
+"""
+Transports between OMNeT++ and the manager.
+TcpTransport and IpcTransport only choose the endpoint of the ZMQ socket, ipc:// avoids the TCP stack
+when OMNeT++ runs on the same machine.
+With multipart=True, OMNeT++ can ask with the field multipart: true of INIT for replies of two frames: the encoded
+reply, with an empty actor_positions and positions_frame: {count}, and the actor records in the layout below.
+The records are rewritten in place at each step in a buffer that grows only with the number of actors, and are
+sent without copy: the buffer can be reused because OMNeT++ sends the next request only after receiving the reply.
+SharedMemoryTransport moves the actor positions of UPDATED_POSITIONS to a ring of blocks in shared memory,
+while the ZMQ messages carry only the control fields. OMNeT++ asks for it with the field shared_memory: true
+of INIT; INIT_COMPLETED then contains in shared_memory the name of the shared memory and its geometry,
+and each UPDATED_POSITIONS contains an empty actor_positions and positions_block: {slot, sequence, count}.
+A reply whose actors don't fit a slot carries its actor_positions inline, without positions_block.
+
+Layout of the shared memory, integers and floats are little endian:
+    header, HEADER_SIZE (64) bytes
+        0   magic b'CNETSHM1'
+        8   uint32 layout version (1)
+        12  uint32 number of slots
+        16  uint32 capacity of a slot [actors]
+        20  uint32 size of an actor record, RECORD_DTYPE.itemsize (144) bytes
+        24  uint64 sequence of the last block written
+    slots, each SLOT_HEADER_SIZE (16) + capacity * record size bytes, the slot of a block is sequence % slots
+        0   uint64 sequence of the block in the slot, written after the records
+        8   uint32 number of actors in the block
+        16  records
+    record
+        0   actor_id, UTF-8 padded with zeros, 64 bytes
+        64  position x, y, z float64
+        88  rotation pitch, yaw, roll float64
+        112 velocity x, y, z float64
+        136 is_net_active uint8
+        137 padding, 7 bytes
+"""
+
+MAGIC = b'CNETSHM1'
+LAYOUT_VERSION = 1
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 16
+RECORD_DTYPE = np.dtype([('actor_id', 'S64'), ('position', '<f8', (3,)), ('rotation', '<f8', (3,)),
+                         ('velocity', '<f8', (3,)), ('is_net_active', 'u1'), ('padding', 'V7')])
+_HEADER = struct.Struct('<8sIIIIQ')
+_SLOT_HEADER = struct.Struct('<QI')
+_SEQUENCE_OFFSET = 24
+
+
+def _selected_rows(registry, selected):
+    if selected is None:
+        return slice(0, len(registry)), len(registry)
+    rows = np.flatnonzero(selected)
+    return rows, len(rows)
+
+
+_segments = itertools.count()  # Numbers the shared memories created by this process
+
+
+def _write_records(records, ids, registry, rows, count):
+    records['actor_id'][:count] = ids[rows]
+    records['position'][:count] = registry.positions[rows]
+    records['rotation'][:count] = registry.rotations[rows]
+    records['velocity'][:count] = registry.velocities[rows]
+    records['is_net_active'][:count] = registry.alive[rows]
+
+
+class CarlanetTransport:
+    def __init__(self, endpoint, multipart=False):
+        """
+        :param endpoint: endpoint bound by the socket of the manager, e.g. tcp://*:5555 or ipc:///tmp/carlanet
+        :param multipart: offer to OMNeT++ replies whose actor positions are sent as a frame of records
+        """
+        self.endpoint = endpoint
+        self.multipart = multipart
+        self._stats = CarlanetStats(False)
+        self._frame_active = False
+        self._buffer: np.ndarray = None
+        self._records: np.ndarray = None
+        self._pending_frame = None
+        self._ids_version, self._ids = None, None
+
+    def attach(self, stats: CarlanetStats):
+        """Called by the manager, the counters of the copies and allocations of the sends are recorded in stats"""
+        self._stats = stats
+
+    def negotiate(self, init_message) -> dict:
+        """:return: the fields added to INIT_COMPLETED for the options requested by OMNeT++ in INIT and enabled"""
+        if self.multipart and init_message.multipart:
+            self._frame_active = True
+            return {'multipart': True}
+        return {}
+
+    def _encoded_ids(self, registry):
+        """:return: the actor ids in the format of the records, None if an id is too long"""
+        if self._ids_version != registry.version:
+            ids = [actor_id.encode('utf-8') for actor_id in registry.ids]
+            too_long = any(len(actor_id) > RECORD_DTYPE['actor_id'].itemsize for actor_id in ids)
+            self._ids = None if too_long else np.array(ids, dtype=RECORD_DTYPE['actor_id'])
+            self._ids_version = registry.version
+        return self._ids
+
+    def _frame_records(self, count) -> np.ndarray:
+        if self._records is None or len(self._records) < count:
+            capacity = max(count, 64, 2 * len(self._records) if self._records is not None else 0)
+            self._buffer = np.zeros(capacity * RECORD_DTYPE.itemsize, dtype=np.uint8)
+            self._records = self._buffer.view(RECORD_DTYPE)
+            self._stats.count(CarlanetStats.BUFFER_ALLOCATIONS)
+        return self._records
+
+    def write_positions(self, res, registry, selected=None):
+        """Add to the reply the positions of the selected actors of the registry"""
+        ids = self._encoded_ids(registry) if self._frame_active else None
+        if ids is None:
+            res.actor_positions = registry.to_actor_positions(selected)
+            return
+        rows, count = _selected_rows(registry, selected)
+        _write_records(self._frame_records(count), ids, registry, rows, count)
+        self._pending_frame = memoryview(self._buffer)[:count * RECORD_DTYPE.itemsize]
+        res.actor_positions = []
+        res['positions_frame'] = {'count': count}
+
+    def frames(self, data: bytes) -> list:
+        """:return: the frames of the reply, the encoded reply followed by the positions written for it if any"""
+        frame, self._pending_frame = self._pending_frame, None
+        return [data] if frame is None else [data, frame]
+
+    def count_copies(self, frames, copy_threshold):
+        """ZMQ copies the frames sent with copy=False when they are smaller than copy_threshold"""
+        copied = len(frames[0])
+        for frame in frames[1:]:
+            if frame.nbytes < copy_threshold:
+                copied += frame.nbytes
+        self._stats.count(CarlanetStats.BYTES_COPIED, copied)
+
+    def send(self, socket, frames: list):
+        """:param frames: the frames of the reply, see frames"""
+        if len(frames) == 1:
+            socket.send(frames[0])
+        else:
+            socket.send_multipart(frames, copy=False)
+        self.count_copies(frames, socket.copy_threshold)
+
+    def close(self):
+        ...
+
+
+class TcpTransport(CarlanetTransport):
+    def __init__(self, listening_port, multipart=False):
+        super().__init__(f'tcp://*:{listening_port}', multipart)
+
+
+class IpcTransport(CarlanetTransport):
+    def __init__(self, path, multipart=False):
+        super().__init__(f'ipc://{path}', multipart)
+
+
+class SharedMemoryTransport(CarlanetTransport):
+    def __init__(self, endpoint, name=None, slot_count=4, slot_capacity=1024, multipart=False):
+        """
+        :param endpoint: endpoint of the ZMQ socket carrying the control messages
+        :param name: name of the shared memory, it's sent to OMNeT++; by default it's unique to the transport, so
+            the runs on the same machine, even in the same process, don't share it
+        :param slot_capacity: maximum number of actors of a block, larger selections are sent in the reply
+        """
+        super().__init__(endpoint, multipart)
+        self.name = name if name else f'carlanet_{os.getpid()}_{next(_segments)}'
+        self.slot_count = slot_count
+        self.slot_capacity = slot_capacity
+        self._slot_size = SLOT_HEADER_SIZE + slot_capacity * RECORD_DTYPE.itemsize
+        self._shm = None  # multiprocessing.shared_memory.SharedMemory, available from Python 3.8
+        self._slots = None
+        self._sequence = 0
+
+    def _create_shared_memory(self):
+        # Imported here since it requires Python 3.8, the other transports work also with the older versions
+        from multiprocessing import shared_memory
+        size = HEADER_SIZE + self.slot_count * self._slot_size
+        try:
+            self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # It can belong to a run in progress, it's never removed here
+            raise FileExistsError(f'The shared memory {self.name} already exists, it is in use by another run or it '
+                                  f'was left by a run that was not closed') from None
+        _HEADER.pack_into(self._shm.buf, 0, MAGIC, LAYOUT_VERSION, self.slot_count, self.slot_capacity,
+                          RECORD_DTYPE.itemsize, 0)
+        self._slots = [np.ndarray((self.slot_capacity,), dtype=RECORD_DTYPE, buffer=self._shm.buf,
+                                  offset=HEADER_SIZE + slot * self._slot_size + SLOT_HEADER_SIZE)
+                       for slot in range(self.slot_count)]
+        self._sequence = 0
+
+    def negotiate(self, init_message) -> dict:
+        res = super().negotiate(init_message)
+        if init_message.shared_memory:
+            if self._shm is None:
+                self._create_shared_memory()
+            res['shared_memory'] = {'name': self._shm.name, 'layout_version': LAYOUT_VERSION,
+                                    'slot_count': self.slot_count, 'slot_capacity': self.slot_capacity,
+                                    'record_size': RECORD_DTYPE.itemsize}
+        return res
+
+    def write_positions(self, res, registry, selected=None):
+        rows, count = _selected_rows(registry, selected)
+        ids = self._encoded_ids(registry) if self._shm is not None and count <= self.slot_capacity else None
+        if ids is None:
+            super().write_positions(res, registry, selected)
+            return
+        self._sequence += 1
+        slot = self._sequence % self.slot_count
+        _write_records(self._slots[slot], ids, registry, rows, count)
+        _SLOT_HEADER.pack_into(self._shm.buf, HEADER_SIZE + slot * self._slot_size, self._sequence, count)
+        struct.pack_into('<Q', self._shm.buf, _SEQUENCE_OFFSET, self._sequence)
+        res.actor_positions = []
+        res['positions_block'] = {'slot': slot, 'sequence': self._sequence, 'count': count}
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._slots = None  # Views on the buffer must be released before closing it
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+
+def _to_actor_positions(records) -> list:
+    return [{'actor_id': record['actor_id'].decode('utf-8'), 'position': record['position'].tolist(),
+             'rotation': record['rotation'].tolist(), 'velocity': record['velocity'].tolist(),
+             'is_net_active': bool(record['is_net_active'])} for record in records]
+
+
+def read_positions_frame(frame) -> list:
+    """
+    Read the frame of the positions of a multipart reply as OMNeT++ does, used to check the layout
+    :return: the actor positions in the format of the actor_positions field
+    """
+    return _to_actor_positions(np.frombuffer(frame, dtype=RECORD_DTYPE))
+
+
+def read_positions_block(buffer, positions_block) -> list:
+    """
+    Read a block as OMNeT++ does, used to check the layout
+    :param buffer: the shared memory, e.g. SharedMemory(name).buf
+    :param positions_block: positions_block field of UPDATED_POSITIONS
+    :return: the actor positions in the format of the actor_positions field
+    """
+    magic, _, _, slot_capacity, record_size, _ = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError('The shared memory was not written by SharedMemoryTransport')
+    offset = HEADER_SIZE + positions_block['slot'] * (SLOT_HEADER_SIZE + slot_capacity * record_size)
+    sequence, count = _SLOT_HEADER.unpack_from(buffer, offset)
+    if sequence != positions_block['sequence']:
+        raise ValueError(f'The block {positions_block["sequence"]} was overwritten by the block {sequence}')
+    return _to_actor_positions(
+        np.ndarray((count,), dtype=RECORD_DTYPE, buffer=buffer, offset=offset + SLOT_HEADER_SIZE).copy())
@@ -0,0 +1,69 @@
+import threading
+import time
+
+"""
+Deadlines of the main loop of the manager.
+A callback of the listener that runs longer than its budget emits a SlowCallbackWarning once it returns.
+A step that is still in progress after its deadline, e.g. because a world tick or a callback is stuck, is reported
+by the Watchdog thread while it's stuck, with the phase it's in: a blocking call to CARLA can't be interrupted,
+so the warning is the only way to see it before it returns.
+"""
+
+
+class SlowCallbackWarning(RuntimeWarning):
+    def __init__(self, phase, timestamp, duration, budget):
+        super().__init__(f'{phase} at the timestamp {timestamp} ran for {duration:.3f} s, over its budget of '
+                         f'{budget} s')
+        self.phase = phase
+        self.timestamp = timestamp
+        self.duration = duration
+        self.budget = budget
+
+
+class Watchdog:
+    def __init__(self, deadline, on_overrun, period=None):
+        """
+        :param deadline: maximum duration of an operation [s]
+        :param on_overrun: called by the thread of the watchdog with (label, elapsed time) when an operation in progress
+            goes over the deadline, once per operation
+        :param period: interval between the checks, by default a quarter of the deadline
+        """
+        self.deadline = deadline
+        self._on_overrun = on_overrun
+        self._period = period if period else deadline / 4
+        self._label = None
+        self._started = None  # perf_counter at the beginning of the operation in progress
+        self._reported = False
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def begin(self, label):
+        self._label, self._reported = label, False
+        self._started = time.perf_counter()
+
+    def end(self):
+        self._started = None
+
+    def _watch(self):
+        while not self._stopped.wait(self._period):
+            started, label = self._started, self._label
+            if started is None or self._reported:
+                continue
+            elapsed = time.perf_counter() - started
+            if elapsed > self.deadline:
+                self._reported = True
+                self._on_overrun(label, elapsed)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name='carlanet-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
@@ -1,3 +1,17 @@
 from pycarlanet.CarlanetEventListener import *
 from pycarlanet.CarlanetActor import *
-from pycarlanet.CarlanetManager import *
\ No newline at end of file
+from pycarlanet.CarlanetCommandQueue import *
+from pycarlanet.CarlanetActorRegistry import *
+from pycarlanet.CarlanetCodec import *
+from pycarlanet.CarlanetMessages import *
+from pycarlanet.CarlanetPositionFilter import *
+from pycarlanet.CarlanetStats import *
+from pycarlanet.CarlanetTransport import *
+from pycarlanet.CarlanetSensorPipeline import *
+from pycarlanet.CarlanetMessageLogger import *
+from pycarlanet.CarlanetMetrics import *
+from pycarlanet.CarlanetWatchdog import *
+from pycarlanet.CarlanetManager import *
+from pycarlanet.AsyncCarlanetManager import *
+from pycarlanet.CarlanetMultiRunServer import *
+from pycarlanet.CarlanetReplayManager import *
\ No newline at end of file
@@ -13,8 +13,12 @@ setup(
     python_requires='>=2.7,!=3.0.*,!=3.1.*,!=3.2.*,!=3.3.*,!=3.4.*,!=3.5.*,<3.9',
     install_requires=[
         'pyzmq==23.2.1',
-        'carla==0.9.13'
+        'carla==0.9.13',
+        'numpy'
     ],
+    extras_require={
+        'msgpack': ['msgpack>=1.0']
+    },
     project_urls={
         'Source': 'https://github.com/jaivra/pycarlanet',
     },
@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import carla
+
+from pycarlanet import CarlanetActor, CarlanetActorRegistry
+
+
+def test_forwarded_methods_are_bound_once():
+    carla_actor = MagicMock()
+    actor = CarlanetActor(carla_actor, True)
+    assert actor.get_transform is actor.get_transform
+    actor.get_transform()
+    carla_actor.get_transform.assert_called_once()
+
+
+def test_cached_properties():
+    carla_actor = MagicMock()
+    carla_actor.id, carla_actor.type_id = 7, 'vehicle.tesla.model3'
+    actor = CarlanetActor(carla_actor, False)
+    assert (actor.id, actor.type_id) == (7, 'vehicle.tesla.model3')
+    carla_actor.id = 8
+    assert actor.id == 7
+    assert actor.carla_actor is carla_actor
+    assert actor.alive is False
+
+
+def _state_mock():
+    state = MagicMock()
+    state.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(1, 2, 3))
+    state.get_velocity.return_value = carla.Vector3D(1, 2, 3)
+    return state
+
+
+def test_missing_carla_actor():
+    actor = CarlanetActor(None, True)
+    with pytest.raises(Exception):
+        actor.get_transform()
+
+
+def test_tick_cache_shared_with_registry():
+    carla_actor = _state_mock()
+    actor = CarlanetActor(carla_actor, True)
+    registry = CarlanetActorRegistry()
+    registry['a'] = actor
+    snapshot = MagicMock()
+    snapshot.find.return_value = None
+
+    actor.get_transform()  # Read by the listener
+    registry.update(snapshot)
+    carla_actor.get_transform.assert_called_once()
+    assert registry.query_cache.counters() == {'hits': 1, 'misses': 2}
+
+    registry.query_cache.new_tick()
+    registry.update(snapshot)
+    assert carla_actor.get_transform.call_count == 2
+
+
+def test_tick_cache_seeded_by_snapshot_and_invalidated_by_commands():
+    carla_actor = _state_mock()
+    actor = CarlanetActor(carla_actor, True)
+    registry = CarlanetActorRegistry()
+    registry['a'] = actor
+    snapshot = MagicMock()
+    snapshot.find.return_value = _state_mock()
+    registry.update(snapshot)
+
+    assert actor.get_transform().location.x == snapshot.find.return_value.get_transform.return_value.location.x
+    carla_actor.get_transform.assert_not_called()
+    actor.set_transform(None)
+    actor.get_transform()
+    carla_actor.get_transform.assert_called_once()
+
+
+def test_cached_queries_are_copied():
+    carla_actor = _state_mock()
+    actor = CarlanetActor(carla_actor, True)
+    registry = CarlanetActorRegistry()
+    registry['a'] = actor
+    transform = actor.get_transform()
+    transform.location.z += 2
+    actor.get_velocity().x = 10
+    assert actor.get_transform().location.z == 3
+    assert actor.get_velocity().x == 1
+    carla_actor.get_transform.assert_called_once()
+
+    # The registry sends the state of CARLA for the actors missing from the snapshot
+    snapshot = MagicMock()
+    snapshot.find.return_value = None
+    registry.update(snapshot)
+    assert registry.positions[0].tolist() == [1, 2, 3]
+
+
+def test_query_caches_of_registries_are_independent():
+    first, second = CarlanetActorRegistry(), CarlanetActorRegistry()
+    first_actor, second_actor = CarlanetActor(_state_mock(), True), CarlanetActor(_state_mock(), True)
+    first['a'], second['a'] = first_actor, second_actor
+    first_actor.get_transform()
+    second_actor.get_transform()
+    # A tick of a run doesn't invalidate the cache of the other
+    first.query_cache.new_tick()
+    first_actor.get_transform()
+    second_actor.get_transform()
+    assert first_actor.carla_actor.get_transform.call_count == 2
+    second_actor.carla_actor.get_transform.assert_called_once()
+    assert first.query_cache.counters() == {'hits': 0, 'misses': 2}
+    assert second.query_cache.counters() == {'hits': 1, 'misses': 1}
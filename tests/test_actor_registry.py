@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+import carla
+import numpy as np
+import pytest
+
+from pycarlanet import CarlanetActorRegistry
+
+
+def _snapshot(states):
+    snapshot = MagicMock()
+    snapshot.timestamp.elapsed_seconds = 1.5
+
+    def find(actor_id):
+        if actor_id not in states:
+            return None
+        actor_snapshot = MagicMock()
+        actor_snapshot.get_transform.return_value = carla.Transform(carla.Location(*states[actor_id]),
+                                                                    carla.Rotation(1, 2, 3))
+        actor_snapshot.get_velocity.return_value = carla.Vector3D(4, 5, 6)
+        return actor_snapshot
+
+    snapshot.find.side_effect = find
+    return snapshot
+
+
+def _actor(carla_id):
+    actor = MagicMock()
+    actor.id = carla_id
+    actor.alive = True
+    actor.get_transform.return_value = carla.Transform(carla.Location(-1, -1, -1), carla.Rotation(0, 0, 0))
+    actor.get_velocity.return_value = carla.Vector3D(0, 0, 0)
+    return actor
+
+
+def test_swap_remove_keeps_slots_consistent():
+    registry = CarlanetActorRegistry(initial_capacity=2)
+    for i in range(5):
+        registry[f'actor_{i}'] = _actor(i)
+    registry.update(_snapshot({i: (i, 0, 0) for i in range(5)}))
+
+    del registry['actor_1']
+    assert len(registry) == 4
+    assert registry.slot('actor_4') == 1
+    assert registry.positions[registry.slot('actor_4')].tolist() == [4, 0, 0]
+    assert [p['actor_id'] for p in registry.to_actor_positions()] == ['actor_0', 'actor_4', 'actor_2', 'actor_3']
+    assert 'actor_1' not in registry
+
+
+def test_update_falls_back_on_actors_missing_from_snapshot():
+    registry = CarlanetActorRegistry()
+    registry['a'] = _actor(1)
+    registry['b'] = _actor(2)
+    registry.update(_snapshot({1: (7, 8, 9)}))
+    positions = registry.to_actor_positions()
+    assert positions[0] == {'actor_id': 'a', 'position': [7, 8, 9], 'rotation': [1, 2, 3], 'velocity': [4, 5, 6],
+                            'is_net_active': True}
+    assert positions[1]['position'] == [-1, -1, -1]
+    assert registry.timestamp == 1.5
+
+
+def test_views_are_read_only_and_not_copied():
+    registry = CarlanetActorRegistry()
+    registry['a'] = _actor(1)
+    registry.update(_snapshot({1: (7, 8, 9)}))
+    positions = registry.positions
+    with pytest.raises(ValueError):
+        positions[0, 0] = 0
+    assert np.shares_memory(positions, registry.column(CarlanetActorRegistry.POSITION, writable=True))
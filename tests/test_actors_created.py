@@ -0,0 +1,76 @@
+import json
+from unittest.mock import MagicMock
+
+import carla
+
+from pycarlanet import CarlanetActor, CarlanetEventListener, CarlanetManager, SimulatorStatus, spawn_actors
+from pycarlanet.CarlanetManager import InitMessageHandlerState
+
+
+class BatchListener(CarlanetEventListener):
+    def __init__(self, world):
+        self.world = world
+        self.actor_specs = None
+
+    def omnet_init_completed(self, run_id, carla_configuration, user_defined):
+        return SimulatorStatus.RUNNING, self.world
+
+    def actors_created(self, actor_specs):
+        self.actor_specs = actor_specs
+        carla_actor = MagicMock()
+        carla_actor.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(1, 2, 3))
+        carla_actor.get_velocity.return_value = carla.Vector3D(1, 2, 3)
+        return {'car_id_1': CarlanetActor(carla_actor, True),
+                'car_2': RuntimeError('Spawn failed because of collision')}
+
+
+def test_actors_created_in_batch():
+    world = MagicMock()
+    world.get_snapshot.return_value.timestamp.elapsed_seconds = 0
+    world.get_snapshot.return_value.find.return_value = None
+    listener = BatchListener(world)
+    manager = CarlanetManager(0, listener, collect_stats=False)
+    manager.set_message_handler_state(InitMessageHandlerState)
+    with open('tests/communication_models/init/from_omnet.json') as f:
+        init_request = json.load(f)
+    init_request['moving_actors'] += [{'actor_id': 'car_2', 'actor_type': 'car', 'actor_configuration': {}},
+                                      {'actor_id': 'car_3', 'actor_type': 'car', 'actor_configuration': {}}]
+
+    res = manager._message_handler.handle_message(init_request)
+    assert len(listener.actor_specs) == 3
+    assert [position['actor_id'] for position in res['actor_positions']] == ['car_id_1']
+    assert res['failed_actors'] == [{'actor_id': 'car_2', 'error': 'Spawn failed because of collision'},
+                                    {'actor_id': 'car_3', 'error': 'not created by the listener'}]
+
+
+def test_actor_created_called_for_each_actor_by_default():
+    class SingleListener(BatchListener):
+        actors_created = CarlanetEventListener.actors_created
+
+        def actor_created(self, actor_id, actor_type, actor_config):
+            return BatchListener.actors_created(self, None)[actor_id]
+
+    world = MagicMock()
+    world.get_snapshot.return_value.timestamp.elapsed_seconds = 0
+    world.get_snapshot.return_value.find.return_value = None
+    manager = CarlanetManager(0, SingleListener(world), collect_stats=False)
+    manager.set_message_handler_state(InitMessageHandlerState)
+    with open('tests/communication_models/init/from_omnet.json') as f:
+        init_request = json.load(f)
+
+    res = manager._message_handler.handle_message(init_request)
+    assert [position['actor_id'] for position in res['actor_positions']] == ['car_id_1']
+    assert res['failed_actors'] == []
+
+
+def test_spawn_actors():
+    client = MagicMock()
+    ok, failed = MagicMock(error='', actor_id=10), MagicMock(error='collision', actor_id=0)
+    client.apply_batch_sync.return_value = [ok, failed]
+    carla_actor = MagicMock(id=10)
+    client.get_world.return_value.get_actors.return_value = [carla_actor]
+
+    actors = spawn_actors(client, [('car_1', MagicMock(), MagicMock()), ('car_2', MagicMock(), MagicMock())])
+    client.apply_batch_sync.assert_called_once()
+    assert actors['car_1'].carla_actor is carla_actor
+    assert isinstance(actors['car_2'], RuntimeError)
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import multiprocessing
+import random
+from unittest.mock import MagicMock
+
+import zmq
+
+from pycarlanet import AsyncCarlanetManager, CarlanetEventListener, SimulatorStatus
+
+
+class _AsyncListener(CarlanetEventListener):
+    def __init__(self):
+        self.world = MagicMock()
+        self.world.get_snapshot.return_value.timestamp.elapsed_seconds = 0.5
+
+    async def omnet_init_completed(self, run_id, carla_configuration, user_defined):
+        await asyncio.sleep(0)
+        return SimulatorStatus.RUNNING, self.world
+
+    async def generic_message(self, timestamp, user_defined_message):
+        await asyncio.sleep(0.01)
+        return SimulatorStatus.RUNNING, {'echo': user_defined_message}
+
+    def carla_simulation_step(self, timestamp):
+        return SimulatorStatus.FINISHED_OK
+
+
+def _request(socket, request):
+    socket.send(json.dumps(request).encode('utf-8'))
+    return json.loads(socket.recv().decode('utf-8'))
+
+
+def test_async_manager_with_coroutine_callbacks():
+    port = random.randint(6000, 7000)
+    manager = AsyncCarlanetManager(port, _AsyncListener())
+    p = multiprocessing.Process(target=manager.start_simulation, args=())
+    p.start()
+
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.connect(f'tcp://localhost:{port}')
+    msg = _request(socket, {'message_type': 'INIT', 'timestamp': 0, 'run_id': 'async', 'moving_actors': [],
+                            'carla_configuration': {'carla_timestep': 0.05}, 'user_defined': {}})
+    assert msg['initial_timestamp'] == 0.5
+
+    msg = _request(socket, {'message_type': 'GENERIC_MESSAGE', 'timestamp': 0.5, 'user_defined': {'a': 1}})
+    assert msg['user_defined'] == {'echo': {'a': 1}}
+
+    msg = _request(socket, {'message_type': 'SIMULATION_STEP', 'timestamp': 0.55})
+    assert msg['simulation_status'] == SimulatorStatus.FINISHED_OK.value
+    p.join(5)
+    assert not p.is_alive()
+
+
+def test_coroutine_callbacks_are_measured_until_they_complete():
+    manager = AsyncCarlanetManager(0, _AsyncListener())
+
+    async def invoke():
+        manager._loop = asyncio.get_running_loop()
+        # From the worker thread, as the handlers of the messages
+        await manager._loop.run_in_executor(None, manager._invoke_listener, 'generic_message', 0, {})
+        # From the event loop, as simulation_finished and simulation_error
+        await manager._invoke_listener_async('generic_message', 0, {})
+
+    asyncio.run(invoke())
+    summary = manager.stats()['listener.generic_message']
+    assert summary['count'] == 2
+    assert summary['p50'] >= 0.01
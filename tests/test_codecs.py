@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from pycarlanet import JsonCodec
+
+
+def _read_model(type_request, direction):
+    with open(f'tests/communication_models/{type_request}/{direction}.json') as f:
+        return json.load(f)
+
+
+def _positions_message(n_actors):
+    return {
+        'message_type': 'UPDATED_POSITIONS',
+        'simulation_status': 0,
+        'actor_positions': [{
+            'actor_id': f'car_{i}',
+            'position': [i * 1.5, -318.70001221, 0.0],
+            'rotation': [0.1, 90.25, 0.0],
+            'velocity': [13.2, 0.0, -0.01],
+            'is_net_active': i % 2 == 0
+        } for i in range(n_actors)]
+    }
+
+
+def _codecs():
+    codecs = [JsonCodec()]
+    try:
+        from pycarlanet import MsgpackCodec
+        codecs.append(MsgpackCodec())
+    except ImportError:
+        pass
+    return codecs
+
+
+@pytest.mark.parametrize('codec', _codecs(), ids=lambda c: c.name)
+@pytest.mark.parametrize('type_request', ['init', 'message', 'simulation_step'])
+def test_round_trip_communication_models(codec, type_request):
+    for direction in ['from_omnet', 'to_omnet']:
+        message = _read_model(type_request, direction)
+        assert codec.decode(codec.encode(message)) == message
+
+
+@pytest.mark.parametrize('codec', _codecs(), ids=lambda c: c.name)
+def test_round_trip_actor_positions(codec):
+    message = _positions_message(100)
+    assert codec.decode(codec.encode(message)) == message
+
+
+def test_msgpack_smaller_than_json():
+    pytest.importorskip('msgpack')
+    from pycarlanet import MsgpackCodec
+    message = _positions_message(100)
+    assert len(MsgpackCodec().encode(message)) < len(JsonCodec().encode(message))
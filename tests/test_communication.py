@@ -47,10 +47,15 @@ def test_init_with_my_client():
     snapshot.timestamp.elapsed_seconds = carla_timestamp
     omnet_world.get_snapshot.return_value = snapshot
 
+    actor_snapshot = MagicMock()
+    actor_snapshot.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(1, 2, 3))
+    actor_snapshot.get_velocity.return_value = carla.Vector3D(1, 2, 3)
+    snapshot.find.return_value = actor_snapshot
 
+    # The actor itself must not be queried when its state is contained in the snapshot
     carla_actor = MagicMock()
-    carla_actor.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(1, 2, 3))
-    carla_actor.get_velocity.return_value = carla.Vector3D(1, 2, 3)
+    carla_actor.get_transform.return_value = carla.Transform(carla.Location(9, 9, 9), carla.Rotation(9, 9, 9))
+    carla_actor.get_velocity.return_value = carla.Vector3D(9, 9, 9)
     # carla_actor.alive.return_value = True
     carla_actor.alive = True
     omnet_worl_listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
@@ -81,6 +86,7 @@ def test_save_configuration():
     omnet_world.get_snapshot = MagicMock()
     snapshot = MagicMock()
     snapshot.timestamp.elapsed_seconds = carla_timestamp
+    snapshot.find.return_value = None  # Actor state is read directly from the actor
     omnet_world.get_snapshot.return_value = snapshot
 
     carla_actor = MagicMock()
@@ -149,8 +155,36 @@ def test_simulation_step_with_my_client():
     _end_server(p)
 
 
-def _start_server(port, omnet_world_listener, save_config_path=None):
-    carlanet_manager = CarlanetManager(port, omnet_world_listener, save_config_path)
+def test_codec_negotiation():
+    msgpack = pytest.importorskip('msgpack')
+    from pycarlanet import MsgpackCodec, JsonCodec
+    port = random.randint(5000, 6000)
+
+    s = _connect('localhost', port)
+    omnet_world = MagicMock()
+    snapshot = MagicMock()
+    snapshot.timestamp.elapsed_seconds = 0.76
+    omnet_world.get_snapshot.return_value = snapshot
+
+    omnet_worl_listener = _create_init_listener()
+    omnet_worl_listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
+    omnet_worl_listener.carla_simulation_step.return_value = SimulatorStatus.RUNNING
+    p = _start_server(port, omnet_worl_listener, codecs=[MsgpackCodec(), JsonCodec()])
+    init_request = _read_request('init')
+    init_request['moving_actors'] = []
+    init_request['codecs'] = ['msgpack', 'json']
+    _send_message(s, init_request)
+    msg = _receive_message(s)  # The handshake is always in JSON
+    assert msg['codec'] == 'msgpack'
+
+    s.send(msgpack.packb(_read_request('simulation_step')))
+    msg = msgpack.unpackb(s.recv())
+    assert msg['message_type'] == 'UPDATED_POSITIONS'
+    _end_server(p)
+
+
+def _start_server(port, omnet_world_listener, save_config_path=None, **manager_kwargs):
+    carlanet_manager = CarlanetManager(port, omnet_world_listener, save_config_path, **manager_kwargs)
     p = multiprocessing.Process(target=carlanet_manager.start_simulation, args=())
     p.start()
     return p
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import zmq
+
+from pycarlanet import AsyncCarlanetManager, CarlanetManager, CarlanetEventListener, SimulatorStatus, \
+    SlowCallbackWarning
+from pycarlanet.CarlanetManager import RunningMessageHandlerState, OmnetTimeoutCarlanetError
+
+
+class _Listener(CarlanetEventListener):
+    def __init__(self, step_duration=0.0):
+        self.world = MagicMock()
+        self.world.get_snapshot.return_value.timestamp.elapsed_seconds = 0.5
+        self.step_duration = step_duration
+        self.error = None
+
+    def omnet_init_completed(self, run_id, carla_configuration, user_defined):
+        return SimulatorStatus.RUNNING, self.world
+
+    def carla_simulation_step(self, timestamp):
+        time.sleep(self.step_duration)
+        return SimulatorStatus.RUNNING
+
+    def simulation_error(self, exception):
+        self.error = exception
+
+
+def _running_manager(listener, **kwargs):
+    manager = CarlanetManager(0, listener, **kwargs)
+    manager.carla_world = listener.world
+    manager._carla_timestep = 0.01
+    manager.set_message_handler_state(RunningMessageHandlerState)
+    return manager
+
+
+def test_run_ends_when_omnet_disappears():
+    port = random.randint(7000, 8000)
+    listener = _Listener()
+    manager = CarlanetManager(port, listener, recv_timeout=0.2)
+    thread = threading.Thread(target=manager.start_simulation)
+    thread.start()
+
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.connect(f'tcp://localhost:{port}')
+    socket.send(json.dumps({'message_type': 'INIT', 'timestamp': 0, 'run_id': 'dead_peer', 'moving_actors': [],
+                            'carla_configuration': {'carla_timestep': 0.05}, 'user_defined': {}}).encode('utf-8'))
+    socket.recv()
+    socket.close()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert isinstance(listener.error, OmnetTimeoutCarlanetError)
+    assert listener.error.timestamp == 0
+
+
+def test_slow_callback_warning():
+    manager = _running_manager(_Listener(step_duration=0.05), callback_budget={'carla_simulation_step': 0.01})
+    with pytest.warns(SlowCallbackWarning) as record:
+        manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    warning = record[0].message
+    assert (warning.phase, warning.timestamp, warning.budget) == ('carla_simulation_step', None, 0.01)
+    assert warning.duration >= 0.05
+
+
+def test_watchdog_reports_stuck_step():
+    manager = _running_manager(_Listener(step_duration=0.3), step_deadline=0.05)
+    manager._watchdog.start()
+    try:
+        with pytest.warns(SlowCallbackWarning) as record:
+            manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    finally:
+        manager._watchdog.stop()
+    assert len(record) == 1
+    assert record[0].message.phase == 'SIMULATION_STEP (in listener.carla_simulation_step)'
+
+
+def test_slow_coroutine_callback_warning():
+    class _AsyncListener(_Listener):
+        async def generic_message(self, timestamp, user_defined_message):
+            await asyncio.sleep(0.05)
+            return SimulatorStatus.RUNNING, {}
+
+    manager = AsyncCarlanetManager(0, _AsyncListener(), callback_budget=0.02)
+
+    async def invoke():
+        manager._loop = asyncio.get_running_loop()
+        await manager._loop.run_in_executor(None, manager._invoke_listener, 'generic_message', 0, {})
+
+    with pytest.warns(SlowCallbackWarning) as record:
+        asyncio.run(invoke())
+    assert record[0].message.phase == 'generic_message'
+
+
+def test_watchdog_reports_stuck_lookahead_step():
+    listener = _Listener()
+    listener.lookahead_allowed = lambda timestamp: True
+    manager = _running_manager(listener, step_deadline=0.05)
+    manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    listener.step_duration = 0.3
+    manager._watchdog.start()
+    try:
+        with pytest.warns(SlowCallbackWarning) as record:
+            manager._message_handler.answer_sent()
+            manager._message_handler._lookahead.result()
+    finally:
+        manager._watchdog.stop()
+    assert [warning.message.phase for warning in record] == \
+        ['SIMULATION_STEP (lookahead) (in listener.carla_simulation_step)']
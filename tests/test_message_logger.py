@@ -0,0 +1,69 @@
+import io
+import json
+
+from pycarlanet import MessageLogger, JsonCodec
+
+
+def _log(logger, step_types):
+    codec = JsonCodec()
+    logger.start()
+    for i, message_type in enumerate(step_types):
+        request = {'message_type': message_type, 'timestamp': float(i)}
+        logger.request(codec.encode(request), message_type, float(i), codec)
+        logger.reply(codec.encode({'message_type': 'REPLY', 'actor_positions': []}), 'REPLY', 0, codec)
+    logger.stop()
+
+
+def _lines(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_lines_are_compact_and_structured():
+    output = io.StringIO()
+    _log(MessageLogger(output), ['INIT'])
+    request, reply = _lines(output)
+    assert (request['direction'], request['message_type'], request['timestamp']) == ('recv', 'INIT', 0.0)
+    assert request['size'] == len(JsonCodec().encode({'message_type': 'INIT', 'timestamp': 0.0}))
+    assert (reply['direction'], reply['message_type'], reply['actors']) == ('send', 'REPLY', 0)
+    assert 'payload' not in request
+
+
+def test_step_sampling():
+    output = io.StringIO()
+    _log(MessageLogger(output, step_sampling=3), ['INIT'] + ['SIMULATION_STEP'] * 6 + ['GENERIC_MESSAGE'])
+    requests = [line['timestamp'] for line in _lines(output) if line['direction'] == 'recv']
+    assert requests == [0.0, 3.0, 6.0, 7.0]
+    assert len(_lines(output)) == 8
+
+    output = io.StringIO()
+    _log(MessageLogger(output, step_sampling=0), ['SIMULATION_STEP'] * 3 + ['GENERIC_MESSAGE'])
+    assert [line['message_type'] for line in _lines(output)] == ['GENERIC_MESSAGE', 'REPLY']
+
+
+def test_payload_capture_is_bounded():
+    output = io.StringIO()
+    request_size = len(JsonCodec().encode({'message_type': 'INIT', 'timestamp': 0.0}))
+    _log(MessageLogger(output, capture_payloads=True, max_payload_bytes=request_size), ['INIT'])
+    request, reply = _lines(output)
+    assert request['payload'] == {'message_type': 'INIT', 'timestamp': 0.0}
+    assert reply['payload_skipped'] and 'payload' not in reply
+
+    logger = MessageLogger(io.StringIO(), queue_size=2)
+    logger.request(b'{}', 'INIT', 0.0)
+    logger.request(b'{}', 'INIT', 0.0)
+    logger.request(b'{}', 'INIT', 0.0)
+    assert logger.dropped == 1
+
+
+def test_records_keep_only_the_captured_payloads():
+    codec, data = JsonCodec(), JsonCodec().encode({'message_type': 'INIT', 'timestamp': 0.0})
+    for logger in [MessageLogger(io.StringIO()), MessageLogger(io.StringIO(), capture_payloads=True,
+                                                               max_payload_bytes=len(data) - 1)]:
+        logger.request(data, 'INIT', 0.0, codec)
+        record = logger._queue.get_nowait()
+        assert all(field is not data for field in record)
+        assert len(data) in record
+
+    logger = MessageLogger(io.StringIO(), capture_payloads=True)
+    logger.request(data, 'INIT', 0.0, codec)
+    assert logger._queue.get_nowait()[-1] is data
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from pycarlanet import decode_message, InitMessage, SimulationStepMessage, MalformedMessageCarlanetError, \
+    UpdatedPositionsMessage
+
+
+def _read_request(type_request):
+    with open(f'tests/communication_models/{type_request}/from_omnet.json') as f:
+        return json.load(f)
+
+
+def test_decode_init():
+    init_request = _read_request('init')
+    message = decode_message(init_request)
+    assert isinstance(message, InitMessage)
+    assert message.run_id == init_request['run_id']
+    assert message.codecs is None
+    assert message.to_dict() == init_request
+
+
+def test_decode_simulation_step():
+    message = decode_message({'message_type': 'SIMULATION_STEP', 'timestamp': 0.5})
+    assert isinstance(message, SimulationStepMessage)
+    assert message.timestamp == 0.5
+
+
+@pytest.mark.parametrize('data', [
+    [],
+    {'message_type': 'UNKNOWN', 'timestamp': 0},
+    {'message_type': 'SIMULATION_STEP'},
+    {'message_type': 'SIMULATION_STEP', 'timestamp': '0.5'},
+    {'message_type': 'GENERIC_MESSAGE', 'timestamp': 0},
+])
+def test_malformed_messages(data):
+    with pytest.raises(MalformedMessageCarlanetError):
+        decode_message(data)
+
+
+def test_malformed_moving_actor():
+    init_request = _read_request('init')
+    del init_request['moving_actors'][0]['actor_type']
+    with pytest.raises(MalformedMessageCarlanetError, match='actor_type'):
+        decode_message(init_request)
+
+
+def test_reply_extra_fields():
+    reply = UpdatedPositionsMessage(simulation_status=0, actor_positions=[])
+    reply['keyframe'] = True
+    assert reply['keyframe']
+    assert reply.to_dict() == {'message_type': 'UPDATED_POSITIONS', 'simulation_status': 0, 'actor_positions': [],
+                               'keyframe': True}
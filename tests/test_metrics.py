@@ -0,0 +1,69 @@
+import json
+import urllib.request
+from unittest.mock import MagicMock
+
+import zmq
+
+from pycarlanet import CarlanetManager, SimulatorStatus, RunMetrics, PrometheusExporter, ZmqMetricsPublisher
+from pycarlanet.CarlanetManager import RunningMessageHandlerState
+
+
+def test_manager_updates_metrics_of_the_run():
+    omnet_world_listener = MagicMock()
+    omnet_world_listener.carla_simulation_step.return_value = SimulatorStatus.RUNNING
+    omnet_world_listener.generic_message.return_value = (SimulatorStatus.RUNNING, {})
+    manager = CarlanetManager(0, omnet_world_listener, metrics_exporter=ZmqMetricsPublisher())
+    manager.carla_world = MagicMock()
+    manager._carla_timestep = 0.01
+    manager._metrics = RunMetrics()
+    manager.set_message_handler_state(RunningMessageHandlerState)
+    for timestamp in (1.0, 1.01, 1.02):
+        manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': timestamp})
+    manager._message_handler.handle_message({'message_type': 'GENERIC_MESSAGE', 'timestamp': 1.02,
+                                             'user_defined': {}})
+    snapshot = manager._metrics.snapshot()
+    assert snapshot['messages'] == {'SIMULATION_STEP': 3, 'GENERIC_MESSAGE': 1}
+    assert snapshot['step_duration']['count'] == 3
+    assert (snapshot['timestamp'], snapshot['actors']) == (1.02, 0)
+    assert snapshot['real_time_factor'] > 0
+
+
+def _metrics():
+    metrics = RunMetrics()
+    metrics.message_handled('SIMULATION_STEP', 1.0, 0.002, 3)
+    metrics.message_handled('SIMULATION_STEP', 1.1, 0.004, 4)
+    return metrics
+
+
+def test_prometheus_endpoint():
+    exporter = PrometheusExporter(port=0)
+    exporter.attach(_metrics())
+    exporter.start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics', timeout=5) as response:
+            body = response.read().decode('utf-8')
+    finally:
+        exporter.stop()
+    lines = body.splitlines()
+    assert 'carlanet_messages_total{message_type="SIMULATION_STEP"} 2' in lines
+    assert 'carlanet_step_duration_seconds_count 2' in lines
+    assert 'carlanet_step_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'carlanet_actors 4' in lines
+    assert 'carlanet_simulation_timestamp_seconds 1.1' in lines
+
+
+def test_zmq_publisher():
+    exporter = ZmqMetricsPublisher('ipc:///tmp/carlanet_test_metrics', interval=0.01)
+    exporter.attach(_metrics())
+    socket = zmq.Context.instance().socket(zmq.SUB)
+    socket.setsockopt(zmq.SUBSCRIBE, ZmqMetricsPublisher.TOPIC)
+    socket.setsockopt(zmq.RCVTIMEO, 5000)
+    exporter.start()
+    try:
+        socket.connect(exporter.endpoint)
+        topic, payload = socket.recv_multipart()
+    finally:
+        socket.close()
+        exporter.stop()
+    snapshot = json.loads(payload)
+    assert (snapshot['steps'], snapshot['actors'], snapshot['timestamp']) == (2, 4, 1.1)
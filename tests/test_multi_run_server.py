@@ -0,0 +1,130 @@
+import json
+import multiprocessing
+import random
+import time
+from unittest.mock import MagicMock
+
+import zmq
+
+from pycarlanet import CarlanetManager, CarlanetMultiRunServer, SimulatorStatus
+from pycarlanet.CarlanetManager import OmnetTimeoutCarlanetError
+
+
+def _create_manager(run_id, recv_timeout=None):
+    omnet_world = MagicMock()
+    omnet_world.get_snapshot.return_value.timestamp.elapsed_seconds = float(run_id.split('_')[1])
+    omnet_world_listener = MagicMock()
+    omnet_world_listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
+    omnet_world_listener.carla_simulation_step.return_value = SimulatorStatus.FINISHED_OK
+    return CarlanetManager(None, omnet_world_listener, recv_timeout=recv_timeout)
+
+
+def _init_request(run_id):
+    return {'message_type': 'INIT', 'timestamp': 0, 'run_id': run_id, 'moving_actors': [],
+            'carla_configuration': {'carla_timestep': 0.05}, 'user_defined': {}}
+
+
+def _connect(port):
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.connect(f'tcp://localhost:{port}')
+    return socket
+
+
+def _send(socket, request):
+    socket.send(json.dumps(request).encode('utf-8'))
+
+
+def _receive(socket):
+    return json.loads(socket.recv().decode('utf-8'))
+
+
+def test_concurrent_runs_are_routed_by_run_id():
+    port = random.randint(7000, 8000)
+    server = CarlanetMultiRunServer(port, _create_manager, max_runs=2)
+    p = multiprocessing.Process(target=server.start_server, args=())
+    p.start()
+
+    first, second = _connect(port), _connect(port)
+    _send(first, _init_request('run_1'))
+    _send(second, _init_request('run_2'))
+    assert _receive(second)['initial_timestamp'] == 2
+    assert _receive(first)['initial_timestamp'] == 1
+
+    # A run with the same run_id of one in progress is refused
+    duplicated = _connect(port)
+    _send(duplicated, _init_request('run_1'))
+    assert _receive(duplicated)['simulation_status'] == SimulatorStatus.FINISHED_ERROR.value
+
+    for socket in [first, second]:
+        _send(socket, {'message_type': 'SIMULATION_STEP', 'timestamp': 0.05})
+        assert _receive(socket)['simulation_status'] == SimulatorStatus.FINISHED_OK.value
+    p.join(5)
+    assert not p.is_alive()
+
+
+def _server_with_requests(requests, max_runs=None, recv_timeout=None):
+    """Server whose socket receives the given envelopes, then fails like a broken socket"""
+    managers = dict()
+
+    def manager_factory(run_id):
+        managers[run_id] = _create_manager(run_id, recv_timeout)
+        managers[run_id]._end_run = MagicMock(wraps=managers[run_id]._end_run)
+        return managers[run_id]
+
+    server = CarlanetMultiRunServer(0, manager_factory, max_runs=max_runs)
+    server._start_server = MagicMock()
+    server.socket = MagicMock()
+    server.socket.recv_multipart.side_effect = requests + [zmq.ZMQError()]
+    # No other message arrives after the requests
+    server.socket.poll.side_effect = lambda timeout: time.sleep(timeout / 1000) or False
+    return server, managers
+
+
+def _encode(request):
+    return json.dumps(request).encode('utf-8')
+
+
+def test_bad_envelope_ends_only_the_run_of_its_peer():
+    server, managers = _server_with_requests([
+        [b'first', b'', _encode(_init_request('run_1'))],
+        [b'second', b'', _encode(_init_request('run_2'))],
+        [b'first', b'', b'unexpected', b'frames'],
+        [b'unknown', b'not empty', b'{}'],
+    ])
+    try:
+        server.start_server()
+    except zmq.ZMQError:
+        pass
+    first, second = managers['run_1'], managers['run_2']
+    first._omnet_world_listener.simulation_error.assert_called_once()
+    assert isinstance(first._omnet_world_listener.simulation_error.call_args[0][0], ValueError)
+    first._end_run.assert_called_once()
+    # The other run went on until the socket failed
+    assert second._omnet_world_listener.simulation_error.call_args[0][0].__class__ is zmq.ZMQError
+
+
+def test_active_runs_are_ended_when_the_server_exits():
+    server, managers = _server_with_requests([
+        [b'first', b'', _encode(_init_request('run_1'))],
+        [b'second', b'', _encode(_init_request('run_2'))],
+    ])
+    try:
+        server.start_server()
+    except zmq.ZMQError:
+        pass
+    for manager in managers.values():
+        manager._end_run.assert_called_once()
+    assert server.active_runs == []
+    server.socket.close.assert_called_once()
+
+
+def test_run_without_messages_of_omnet_is_ended_after_its_recv_timeout():
+    server, managers = _server_with_requests([[b'first', b'', _encode(_init_request('run_1'))]], max_runs=1,
+                                             recv_timeout=0.05)
+    start = time.monotonic()
+    server.start_server()
+    assert time.monotonic() - start >= 0.05
+    manager = managers['run_1']
+    assert isinstance(manager._omnet_world_listener.simulation_error.call_args[0][0], OmnetTimeoutCarlanetError)
+    manager._end_run.assert_called_once()
+    assert server.active_runs == []
@@ -0,0 +1,149 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from pycarlanet import CarlanetActorRegistry, DeltaPositionFilter, RegionOfInterestFilter, DeadReckoningFilter, \
+    decode_message
+
+
+def _registry(delta_filter, actor_ids):
+    registry = CarlanetActorRegistry(initial_capacity=1)
+    delta_filter.attach(registry)
+    for actor_id in actor_ids:
+        registry[actor_id] = MagicMock()
+    registry.column(CarlanetActorRegistry.ALIVE, writable=True)[:] = True
+    return registry
+
+
+def _move(registry, actor_id, x, is_net_active=True):
+    slot = registry.slot(actor_id)
+    registry.column(CarlanetActorRegistry.POSITION, writable=True)[slot] = [x, 0, 0]
+    registry.column(CarlanetActorRegistry.ALIVE, writable=True)[slot] = is_net_active
+
+
+def _filter(delta_filter, registry, res=None):
+    res = dict() if res is None else res
+    to_send = delta_filter.filter(registry, np.ones(len(registry), dtype=bool), res)
+    return [position['actor_id'] for position in registry.to_actor_positions(to_send)]
+
+
+def test_delta_sends_only_changed_actors():
+    delta_filter = DeltaPositionFilter(position_epsilon=0.1, keyframe_interval=None)
+    registry = _registry(delta_filter, ['a', 'b'])
+    res = dict()
+    assert _filter(delta_filter, registry, res) == ['a', 'b']
+    assert res['keyframe'] and res['delta_encoded']
+
+    res = dict()
+    _move(registry, 'a', 0.05)
+    _move(registry, 'b', 1)
+    assert _filter(delta_filter, registry, res) == ['b']
+    assert not res['keyframe']
+
+    # Changes are compared with the last position sent, so small movements accumulate
+    _move(registry, 'a', 0.15)
+    assert _filter(delta_filter, registry) == ['a']
+
+    _move(registry, 'b', 1, is_net_active=False)
+    assert _filter(delta_filter, registry) == ['b']
+
+    registry['c'] = MagicMock()
+    assert _filter(delta_filter, registry) == ['c']
+
+
+def test_delta_removed_actors_and_keyframes():
+    delta_filter = DeltaPositionFilter(keyframe_interval=2)
+    registry = _registry(delta_filter, ['a', 'b', 'c'])
+    _filter(delta_filter, registry)
+
+    res = dict()
+    del registry['a']
+    assert _filter(delta_filter, registry, res) == []
+    assert res['removed_actors'] == ['a']
+
+    res = dict()
+    assert _filter(delta_filter, registry, res) == []
+    assert res['removed_actors'] == [] and not res['keyframe']
+
+    res = dict()
+    assert _filter(delta_filter, registry, res) == ['c', 'b']
+    assert res['keyframe']
+
+    delta_filter.reset()
+    res = dict()
+    _filter(delta_filter, registry, res)
+    assert res['keyframe']
+
+
+def _roi_registry(roi_filter, positions):
+    registry = CarlanetActorRegistry()
+    roi_filter.attach(registry)
+    for actor_id, (x, y) in positions.items():
+        registry[actor_id] = MagicMock()
+        _move(registry, actor_id, x)
+        registry.column(CarlanetActorRegistry.POSITION, writable=True)[registry.slot(actor_id), 1] = y
+    return registry
+
+
+def test_region_of_interest_filter():
+    roi_filter = RegionOfInterestFilter(cell_size=10)
+    registry = _roi_registry(roi_filter, {'a': (0, 0), 'b': (25, 5), 'c': (500, 500)})
+    roi_filter.set_regions([{'region_id': 'rsu1', 'center': [0, 0], 'radius': 5},
+                            {'region_id': 'rsu2', 'min': [20, 0], 'max': [40, 10]}])
+    res = dict()
+    assert _filter(roi_filter, registry, res) == ['a', 'b']
+    assert res['roi_entered'] == {'rsu1': ['a'], 'rsu2': ['b']}
+    assert res['roi_left'] == {}
+
+    _move(registry, 'a', 30)
+    res = dict()
+    assert _filter(roi_filter, registry, res) == ['a', 'b']
+    assert res['roi_entered'] == {'rsu2': ['a']}
+    assert res['roi_left'] == {'rsu1': ['a']}
+
+    del registry['b']
+    res = dict()
+    assert _filter(roi_filter, registry, res) == ['a']
+    assert res['roi_left'] == {'rsu2': ['b']}
+
+
+def test_region_of_interest_from_messages():
+    roi_filter = RegionOfInterestFilter()
+    registry = _roi_registry(roi_filter, {'a': (0, 0), 'b': (1000, 0)})
+    assert _filter(roi_filter, registry) == ['a', 'b']
+    roi_filter.message_received(decode_message({'message_type': 'GENERIC_MESSAGE', 'timestamp': 0, 'user_defined': {},
+                                                'regions_of_interest': [{'region_id': 'r', 'center': [1000, 0],
+                                                                         'radius': 1}]}))
+    assert _filter(roi_filter, registry) == ['b']
+
+
+def test_dead_reckoning_filter():
+    dr_filter = DeadReckoningFilter(position_error=0.5)
+    registry = _registry(dr_filter, ['a', 'b'])
+    velocities = registry.column(CarlanetActorRegistry.VELOCITY, writable=True)
+    velocities[:] = [10, 0, 0]
+    registry.timestamp = 0.0
+    res = dict()
+    assert _filter(dr_filter, registry, res) == ['a', 'b']
+    assert res['dead_reckoning']
+
+    # 'a' follows the extrapolation, 'b' stopped
+    registry.timestamp = 0.1
+    _move(registry, 'a', 1.0)
+    _move(registry, 'b', 0.6)
+    assert _filter(dr_filter, registry) == []
+    registry.timestamp = 0.2
+    _move(registry, 'a', 2.0)
+    _move(registry, 'b', 0.6)
+    velocities[registry.slot('b')] = [0, 0, 0]
+    assert _filter(dr_filter, registry) == ['b']
+
+    dr_filter.set_error_bound('a', 0.01)
+    registry.timestamp = 0.3
+    _move(registry, 'a', 3.1)
+    assert _filter(dr_filter, registry) == ['a']
+
+    del registry['b']
+    res = dict()
+    _filter(dr_filter, registry, res)
+    assert res['removed_actors'] == ['b']
@@ -0,0 +1,79 @@
+import multiprocessing
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+from pycarlanet import CarlanetManager, CarlanetReplayManager, ReplayMismatchCarlanetError, SimulatorStatus
+from pycarlanet import CarlanetRecorder, TcpTransport, SharedMemoryTransport, UpdatedPositionsMessage
+from tests.test_communication import _connect, _create_init_listener, _read_request, _receive_message, \
+    _send_message
+
+
+def _run_session(port, manager):
+    p = multiprocessing.Process(target=manager.start_simulation, args=())
+    p.start()
+    s = _connect('localhost', port)
+    init_request = _read_request('init')
+    init_request['moving_actors'] = []
+    _send_message(s, init_request)
+    replies = [_receive_message(s)]
+    _send_message(s, _read_request('simulation_step'))
+    replies.append(_receive_message(s))
+    p.join(10)
+    return replies
+
+
+def test_record_and_replay(tmp_path):
+    record_path = str(tmp_path / 'session.rec')
+    omnet_world = MagicMock()
+    snapshot = MagicMock()
+    snapshot.timestamp.elapsed_seconds = 0.76
+    omnet_world.get_snapshot.return_value = snapshot
+    listener = _create_init_listener()
+    listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
+    listener.carla_simulation_step.return_value = SimulatorStatus.FINISHED_OK
+
+    port = random.randint(5000, 6000)
+    recorded_replies = _run_session(port, CarlanetManager(port, listener, record_path=record_path))
+    kinds = [kind for kind, _ in CarlanetRecorder.read_session(record_path)]
+    assert kinds == [CarlanetRecorder.REQUEST, CarlanetRecorder.REPLY, CarlanetRecorder.CODEC,
+                     CarlanetRecorder.REQUEST, CarlanetRecorder.REPLY]
+
+    port = random.randint(6001, 7000)
+    assert _run_session(port, CarlanetReplayManager(port, record_path)) == recorded_replies
+
+
+def test_replay_mismatch(tmp_path):
+    manager = CarlanetReplayManager(None, str(tmp_path / 'session.rec'))
+    recorded = manager._codec.encode({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    manager._check_request(0, recorded, recorded)
+    different = manager._codec.encode({'message_type': 'SIMULATION_STEP', 'timestamp': 2.0})
+    with pytest.raises(ReplayMismatchCarlanetError):
+        manager._check_request(1, recorded, different)
+
+
+def test_multipart_replies_are_recorded_and_replayed(tmp_path):
+    record_path = str(tmp_path / 'session.rec')
+    manager = CarlanetManager(0, MagicMock(), record_path=record_path, transport=TcpTransport(0, multipart=True))
+    manager._start_run()
+    manager._transport._pending_frame = memoryview(b'records')
+    request = manager._codec.encode({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    manager._recorder.record_request(request)
+    frames = manager._encode_answer(UpdatedPositionsMessage(simulation_status=0, actor_positions=[]))
+    manager._end_run()
+    assert [kind for kind, _ in CarlanetRecorder.read_session(record_path)] == \
+        [CarlanetRecorder.REQUEST, CarlanetRecorder.REPLY, CarlanetRecorder.FRAME]
+
+    replay = CarlanetReplayManager(None, record_path)
+    replay._start_server = MagicMock()
+    replay.socket = MagicMock()
+    replay.socket.recv.return_value = request
+    replay.start_simulation()
+    replay.socket.send_multipart.assert_called_once_with([bytes(frames[0]), b'records'])
+
+
+def test_shared_memory_sessions_are_not_recorded(tmp_path):
+    with pytest.raises(ValueError):
+        CarlanetManager(0, MagicMock(), record_path=str(tmp_path / 'session.rec'),
+                        transport=SharedMemoryTransport('tcp://*:0'))
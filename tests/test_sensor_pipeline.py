@@ -0,0 +1,69 @@
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from pycarlanet import SensorRingBuffer, SensorPipeline
+
+
+def _push(ring, frame):
+    ring.push(frame, frame * 0.1, np.full((2, 2), frame, dtype=np.uint8))
+
+
+def test_ring_drops_oldest_frames_not_consumed():
+    ring = SensorRingBuffer((2, 2), capacity=3)
+    for frame in range(5):
+        _push(ring, frame)
+    assert ring.dropped == 2
+    assert [ring.pop().frame for _ in range(3)] + [ring.pop()] == [2, 3, 4, None]
+
+
+def test_slot_being_consumed_is_not_overwritten():
+    ring = SensorRingBuffer((2, 2), capacity=2)
+    _push(ring, 0)
+    consumed = ring.pop()
+    for frame in range(1, 10):
+        _push(ring, frame)
+    assert ring.is_valid(consumed)
+    assert (consumed.data == 0).all()
+    assert ring.pop().frame == 9
+
+
+def test_latest_frame_is_a_read_only_view():
+    ring = SensorRingBuffer((2, 2), capacity=3)
+    for frame in range(4):
+        _push(ring, frame)
+    latest = ring.latest()
+    assert latest.frame == 3
+    assert latest.data.base is not None
+    with pytest.raises(ValueError):
+        latest.data[0, 0] = 1
+    assert ring.latest(timestamp=0.25).frame == 2
+    assert ring.latest(timestamp=0.05) is None
+    older = ring.latest(timestamp=0.25)
+    _push(ring, 4)
+    assert ring.is_valid(older)
+    _push(ring, 5)
+    assert not ring.is_valid(older)
+
+
+def test_pipeline_consumes_frames_on_worker_thread():
+    sensor = MagicMock()
+    consumed, threads = [], set()
+
+    def consumer(name, frame):
+        consumed.append((name, frame.frame, int(frame.data[0, 0])))
+        threads.add(threading.get_ident())
+
+    pipeline = SensorPipeline()
+    pipeline.attach('camera', sensor, (2, 2), consumer=consumer)
+    callback = sensor.listen.call_args[0][0]
+    pipeline.start()
+    for frame in range(3):
+        callback(MagicMock(frame=frame, timestamp=frame * 0.1, raw_data=bytes([frame] * 4)))
+    pipeline.stop()
+    sensor.stop.assert_called_once()
+    assert consumed[-1] == ('camera', 2, 2)
+    assert threading.get_ident() not in threads
+    assert pipeline.counters()['camera.received'] == 3
@@ -0,0 +1,217 @@
+from unittest.mock import MagicMock
+
+import carla
+import pytest
+
+from pycarlanet import CarlanetActor, CarlanetEventListener, CarlanetManager, CarlanetStats, SimulatorStatus
+from pycarlanet.CarlanetManager import RunningMessageHandlerState, InitMessageHandlerState
+
+
+def _running_manager(carla_timestep):
+    omnet_world_listener = MagicMock()
+    omnet_world_listener.carla_simulation_step.return_value = SimulatorStatus.RUNNING
+    manager = CarlanetManager(0, omnet_world_listener)
+    manager.carla_world = MagicMock()
+    manager.carla_world.get_snapshot.return_value.timestamp.elapsed_seconds = 0
+    manager._carla_timestep = carla_timestep
+    manager.set_message_handler_state(RunningMessageHandlerState)
+    return manager
+
+
+def _step(manager, timestamp):
+    manager.carla_world.tick.reset_mock()
+    manager._omnet_world_listener.reset_mock()
+    manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': timestamp})
+    return manager.carla_world.tick.call_count
+
+
+def _initialized_manager(carla_timestep, initial_timestamp, init_timestamp=0):
+    """:param initial_timestamp: time of the world when INIT is handled, sent to OMNeT++ in INIT_COMPLETED"""
+    manager = _running_manager(carla_timestep)
+    manager.carla_world.get_snapshot.return_value.timestamp.elapsed_seconds = initial_timestamp
+    manager._omnet_world_listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, manager.carla_world
+    manager.set_message_handler_state(InitMessageHandlerState)
+    manager._message_handler.handle_message({'message_type': 'INIT', 'timestamp': init_timestamp, 'run_id': 'run',
+                                             'moving_actors': [], 'user_defined': {},
+                                             'carla_configuration': {'carla_timestep': carla_timestep}})
+    return manager
+
+
+def test_multiple_ticks_when_omnet_steps_coarser():
+    manager = _initialized_manager(0.01, 1.0)
+    assert _step(manager, 1.05) == 5
+    ticks_timestamps = [c.args[0] for c in manager._omnet_world_listener.after_world_tick.call_args_list]
+    assert ticks_timestamps == pytest.approx([1.01, 1.02, 1.03, 1.04, 1.05])
+    manager._omnet_world_listener.carla_simulation_step.assert_called_once_with(1.05)
+
+
+def test_first_step_ticks_time_elapsed_since_init():
+    manager = _initialized_manager(0.01, 0)
+    assert [_step(manager, t) for t in [0.1, 0.2, 0.3]] == [10, 10, 10]
+
+
+def test_steps_count_from_the_initial_timestamp_of_carla():
+    # The world was already running before INIT, OMNeT++ steps from the initial_timestamp of INIT_COMPLETED
+    manager = _initialized_manager(0.01, 120.04, init_timestamp=0)
+    assert [_step(manager, t) for t in [120.05, 120.06, 120.07]] == [1, 1, 1]
+
+
+def test_listener_reads_of_the_step_are_served_by_the_snapshot():
+    manager = _running_manager(0.01)
+    carla_actor = MagicMock()
+    manager.add_dynamic_actor('car', CarlanetActor(carla_actor, True))
+    actor_snapshot = manager.carla_world.get_snapshot.return_value.find.return_value
+    actor_snapshot.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(0, 0, 0))
+    actor_snapshot.get_velocity.return_value = carla.Vector3D(1, 0, 0)
+
+    def carla_simulation_step(timestamp):
+        actor = manager.actor_registry['car']
+        assert actor.get_transform().location.x == 1 and actor.get_velocity().x == 1
+        return SimulatorStatus.RUNNING
+
+    manager._omnet_world_listener.carla_simulation_step.side_effect = carla_simulation_step
+    _step(manager, 0.01)
+    _step(manager, 0.02)
+    assert manager.carla_world.get_snapshot.call_count == 2
+    carla_actor.get_transform.assert_not_called()
+    carla_actor.get_velocity.assert_not_called()
+    assert manager.actor_registry.query_cache.counters() == {'hits': 4, 'misses': 0}
+
+
+def test_remainder_is_carried_to_next_steps():
+    manager = _running_manager(0.1)
+    _step(manager, 0)
+    assert [_step(manager, t) for t in [0.14, 0.28, 0.42, 0.56, 0.7]] == [1, 2, 1, 2, 1]
+
+
+def test_at_least_one_tick_per_step():
+    manager = _running_manager(0.1)
+    assert [_step(manager, t) for t in [0, 0.01, 0.02, 0.02]] == [1, 1, 1, 1]
+    assert _step(manager, 0.12) == 1
+    assert _step(_running_manager(None), 5) == 1
+
+
+def _lookahead_manager(carla_timestep):
+    manager = _running_manager(carla_timestep)
+    manager._omnet_world_listener.lookahead_allowed.return_value = True
+    manager._omnet_world_listener.generic_message.return_value = SimulatorStatus.RUNNING, {}
+    return manager
+
+
+def _request(manager, message):
+    answer = manager._message_handler.handle_message(message)
+    manager._answer_sent()
+    return answer
+
+
+def _wait_lookahead(manager):
+    manager._message_handler._lookahead.result()
+    return manager.carla_world.tick.call_count
+
+
+def test_lookahead_runs_next_step_after_answer():
+    manager = _lookahead_manager(0.05)
+    _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    assert _wait_lookahead(manager) == 2
+    manager._omnet_world_listener.carla_simulation_step.assert_called_with(pytest.approx(1.05))
+
+    # A generic message is handled normally, the buffered step is kept
+    _request(manager, {'message_type': 'GENERIC_MESSAGE', 'timestamp': 1.02, 'user_defined': {}})
+    assert manager._message_handler._lookahead is None or manager._message_handler._lookahead.done()
+
+    answer = _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.05})
+    assert answer['message_type'] == 'UPDATED_POSITIONS'
+    assert _wait_lookahead(manager) == 3
+    assert manager._omnet_world_listener.carla_simulation_step.call_count == 3
+
+
+def test_lookahead_ticks_remaining_time_when_prediction_is_wrong():
+    manager = _lookahead_manager(0.05)
+    _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    _wait_lookahead(manager)
+
+    _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.2})
+    manager._message_handler._lookahead.result()
+    manager._omnet_world_listener.before_world_tick.assert_any_call(1.2)
+    # 1 + 1 (lookahead at 1.05) + 3 (up to 1.2) + 4 (lookahead at 1.4, following the last interval)
+    assert manager.carla_world.tick.call_count == 9
+
+
+def test_lookahead_finished_status_ends_the_simulation():
+    manager = _lookahead_manager(0.05)
+    manager._omnet_world_listener.carla_simulation_step.side_effect = [SimulatorStatus.RUNNING,
+                                                                       SimulatorStatus.FINISHED_OK]
+    _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    _wait_lookahead(manager)
+    # OMNeT++ is further than predicted, but the background step already finished the simulation
+    answer = _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.2})
+    assert answer['simulation_status'] == SimulatorStatus.FINISHED_OK.value
+    assert manager.carla_world.tick.call_count == 2
+    assert manager._omnet_world_listener.carla_simulation_step.call_count == 2
+
+
+def test_lookahead_carries_ticks_in_advance():
+    manager = _lookahead_manager(0.05)
+    for timestamp in [1.0, 1.02, 1.07, 1.12, 1.17]:
+        if manager._message_handler._lookahead is not None:
+            _wait_lookahead(manager)
+        manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': timestamp})
+        # The first step ticks once; a background step can be a tick ahead, which is recovered by the next steps
+        carla_time = 1.0 + (manager.carla_world.tick.call_count - 1) * 0.05
+        assert abs(carla_time - timestamp) <= 0.05 + 1e-9
+        manager._answer_sent()
+    assert carla_time == pytest.approx(1.15)
+
+
+def test_no_lookahead_by_default():
+    manager = _running_manager(0.05)
+    _request(manager, {'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    assert manager._message_handler._lookahead is None
+
+
+def test_commands_are_flushed_in_batch_before_tick():
+    manager = _running_manager(0.01)
+    manager.carla_client = MagicMock()
+    carla_actor = MagicMock(id=1)
+    carla_actor.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(1, 2, 3))
+    carla_actor.get_velocity.return_value = carla.Vector3D(1, 2, 3)
+    manager.carla_world.get_snapshot.return_value.find.return_value = None
+    actor = CarlanetActor(carla_actor, True)
+    manager.add_dynamic_actor('car', actor)
+    order = MagicMock()
+    manager.carla_client.apply_batch.side_effect = lambda commands: order('apply_batch', len(commands))
+    manager.carla_world.tick.side_effect = lambda: order('tick')
+
+    actor.apply_command(carla.VehicleControl(throttle=1.0))
+    actor.queue_light_state(carla.VehicleLightState.Brake)
+    manager.command_queue.put(carla.command.SetAutopilot(1, False))
+    manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': 1.0})
+    assert [c.args for c in order.call_args_list] == [('apply_batch', 3), ('tick',)]
+    assert len(manager.command_queue) == 0
+    assert manager.stats()[CarlanetStats.COMMAND_QUEUE_DEPTH]['max'] == 3
+
+
+def test_generic_messages_fall_back_to_generic_message():
+    manager = _running_manager(0.01)
+    manager._omnet_world_listener.generic_message.side_effect = \
+        lambda timestamp, message: (SimulatorStatus.RUNNING, {'echo': message['n']})
+    answer = manager._message_handler.handle_message({'message_type': 'GENERIC_MESSAGES', 'timestamp': 1.0,
+                                                      'user_defined_messages': [{'n': 1}, {'n': 2}]})
+    assert answer.to_dict() == {'message_type': 'GENERIC_RESPONSES', 'simulation_status': 0,
+                                'user_defined_responses': [{'echo': 1}, {'echo': 2}]}
+    assert manager._omnet_world_listener.generic_message.call_count == 2
+
+
+def test_generic_messages_default_of_the_listener_is_handled_by_the_manager():
+    class Listener(CarlanetEventListener):
+        def generic_message(self, timestamp, user_defined_message):
+            status = SimulatorStatus.RUNNING if user_defined_message['n'] < 2 else SimulatorStatus.FINISHED_OK
+            return status, {'echo': user_defined_message['n']}
+
+    manager = CarlanetManager(0, Listener())
+    manager.set_message_handler_state(RunningMessageHandlerState)
+    answer = manager._message_handler.handle_message({'message_type': 'GENERIC_MESSAGES', 'timestamp': 1.0,
+                                                      'user_defined_messages': [{'n': 1}, {'n': 2}, {'n': 3}]})
+    assert answer.user_defined_responses == [{'echo': 1}, {'echo': 2}]
+    # Each message is measured on its own
+    assert manager.stats()[CarlanetStats.LISTENER + 'generic_message']['count'] == 2
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from pycarlanet import CarlanetManager, CarlanetStats, Histogram, SimulatorStatus
+from pycarlanet.CarlanetManager import RunningMessageHandlerState
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(bounds=(1, 2, 5, 10))
+    for value in [0.5] * 50 + [3] * 49 + [20]:
+        histogram.record(value)
+    assert histogram.count == 100
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(99) == 5
+    assert histogram.percentile(100) == 20
+    assert histogram.summary()['buckets'] == [[1, 50], [5, 49], [None, 1]]
+    assert histogram.summary()['mean'] == pytest.approx((25 + 147 + 20) / 100)
+
+
+def test_manager_stats_of_simulation_step():
+    omnet_world_listener = MagicMock()
+    omnet_world_listener.carla_simulation_step.return_value = SimulatorStatus.RUNNING
+    manager = CarlanetManager(0, omnet_world_listener)
+    manager.carla_world = MagicMock()
+    manager.set_message_handler_state(RunningMessageHandlerState)
+    for timestamp in [0.05, 0.1]:
+        manager._message_handler.handle_message({'message_type': 'SIMULATION_STEP', 'timestamp': timestamp})
+
+    stats = manager.stats()
+    for phase in [CarlanetStats.WORLD_TICK, CarlanetStats.POSITIONS_UPDATE, CarlanetStats.POSITIONS_SERIALIZE,
+                  CarlanetStats.LISTENER + 'before_world_tick', CarlanetStats.LISTENER + 'carla_simulation_step']:
+        assert stats[phase]['count'] == 2
+
+
+def test_disabled_stats():
+    manager = CarlanetManager(0, MagicMock(), collect_stats=False)
+    manager._invoke_listener('carla_init_completed')
+    assert manager.stats() == {}
+
+
+def test_counters():
+    stats = CarlanetStats()
+    stats.count('commands', 3)
+    stats.count('commands')
+    assert stats.summary()[CarlanetStats.COUNTERS] == {'commands': 4}
+    assert 'commands' in stats.format()
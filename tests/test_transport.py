@@ -0,0 +1,114 @@
+import json
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+from unittest.mock import MagicMock
+
+import carla
+import numpy as np
+import pytest
+import zmq
+
+from pycarlanet import CarlanetActor, CarlanetActorRegistry, CarlanetManager, IpcTransport, SharedMemoryTransport, \
+    TcpTransport, UpdatedPositionsMessage, read_positions_block, read_positions_frame, SimulatorStatus, decode_message
+from tests.test_communication import _create_init_listener, _read_request
+
+
+def _registry(n_actors):
+    registry = CarlanetActorRegistry()
+    snapshot = MagicMock()
+    snapshot.find.return_value = None
+    for i in range(n_actors):
+        carla_actor = MagicMock()
+        carla_actor.get_transform.return_value = carla.Transform(carla.Location(i, 2, 3), carla.Rotation(4, 5, i))
+        carla_actor.get_velocity.return_value = carla.Vector3D(i, 0, 1)
+        registry[f'car_{i}'] = CarlanetActor(carla_actor, i % 2 == 0)
+    registry.update(snapshot)
+    return registry
+
+
+def test_shared_memory_positions_block():
+    registry = _registry(5)
+    transport = SharedMemoryTransport('ipc:///tmp/unused', name=f'carlanet_test_{random.randint(0, 10 ** 6)}',
+                                      slot_count=2, slot_capacity=4)
+    description = transport.negotiate(decode_message({**_read_request("init"), "shared_memory": True}))["shared_memory"]
+    try:
+        selected = np.array([True, False, True, True, False])
+        res = UpdatedPositionsMessage(simulation_status=0)
+        transport.write_positions(res, registry, selected)
+        assert res.actor_positions == []
+        assert read_positions_block(transport._shm.buf, res['positions_block']) == \
+            registry.to_actor_positions(selected)
+        assert description['record_size'] == 144
+
+        # Actors that don't fit a slot are sent inline
+        res = UpdatedPositionsMessage(simulation_status=0)
+        transport.write_positions(res, registry)
+        assert res.actor_positions == registry.to_actor_positions()
+        assert 'positions_block' not in res.extra
+    finally:
+        transport.close()
+
+
+def test_ipc_endpoint(tmp_path):
+    endpoint = f'ipc://{tmp_path}/carlanet'
+    omnet_world = MagicMock()
+    omnet_world.get_snapshot.return_value.timestamp.elapsed_seconds = 0.5
+    listener = _create_init_listener()
+    listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
+    manager = CarlanetManager(None, listener, transport=IpcTransport(f'{tmp_path}/carlanet'))
+    p = multiprocessing.Process(target=manager.start_simulation, args=())
+    p.start()
+
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.connect(endpoint)
+    init_request = _read_request('init')
+    init_request['moving_actors'] = []
+    socket.send_json(init_request)
+    assert socket.recv_json()['message_type'] == 'INIT_COMPLETED'
+    p.terminate()
+
+
+def test_multipart_positions_frame():
+    port = random.randint(5000, 6000)
+    omnet_world = MagicMock()
+    omnet_world.get_snapshot.return_value.timestamp.elapsed_seconds = 0.5
+    omnet_world.get_snapshot.return_value.find.return_value = None
+    carla_actor = MagicMock()
+    carla_actor.get_transform.return_value = carla.Transform(carla.Location(1, 2, 3), carla.Rotation(4, 5, 6))
+    carla_actor.get_velocity.return_value = carla.Vector3D(7, 8, 9)
+    listener = MagicMock()
+    listener.omnet_init_completed.return_value = SimulatorStatus.RUNNING, omnet_world
+    listener.actor_created.return_value = CarlanetActor(carla_actor, True)
+    listener.carla_simulation_step.return_value = SimulatorStatus.RUNNING
+    manager = CarlanetManager(port, listener, transport=TcpTransport(port, multipart=True))
+    p = multiprocessing.Process(target=manager.start_simulation, args=())
+    p.start()
+
+    socket = zmq.Context().socket(zmq.REQ)
+    socket.connect(f'tcp://localhost:{port}')
+    socket.send_json({**_read_request('init'), 'multipart': True})
+    init_completed = socket.recv_json()
+    assert init_completed['multipart'] is True
+    socket.send_json(_read_request('simulation_step'))
+    header, positions = socket.recv_multipart()
+    assert json.loads(header)['positions_frame'] == {'count': 1}
+    assert read_positions_frame(positions) == init_completed['actor_positions']
+    p.terminate()
+
+
+def test_shared_memory_of_another_run_is_not_removed():
+    first, second = SharedMemoryTransport('ipc:///tmp/unused'), SharedMemoryTransport('ipc:///tmp/unused')
+    assert first.name != second.name
+    init_message = decode_message({**_read_request("init"), "shared_memory": True})
+    first.negotiate(init_message)
+    try:
+        same_name = SharedMemoryTransport('ipc:///tmp/unused', name=first.name)
+        with pytest.raises(FileExistsError):
+            same_name.negotiate(init_message)
+        # The shared memory of the run in progress can still be opened by OMNeT++
+        opened = shared_memory.SharedMemory(name=first.name)
+        assert bytes(opened.buf[:8]) == b'CNETSHM1'
+        opened.close()
+    finally:
+        first.close()